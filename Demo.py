@@ -1,8 +1,9 @@
 from models import DailyWeatherRecord
-from sqlalchemy import create_engine, select
+from sqlalchemy import select
 from pandas import DataFrame
+from constants import get_engine
 
-engine = create_engine("sqlite:///weather.db")
+engine = get_engine()
 stmt = select(DailyWeatherRecord).order_by(DailyWeatherRecord.date_time)
 with engine.connect() as conn:
     weather_df = DataFrame(conn.execute(stmt))
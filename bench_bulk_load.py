@@ -0,0 +1,93 @@
+"""Compare the normal hourly insert path with ``bulk_load`` backfills.
+
+Generates ``--years`` years of synthetic solar hours, loads them into a fresh
+database once through ``StorageBackend.bulk_insert`` (what
+``import-weather-data`` does by default) and once through ``bulk_load`` (what
+``--bulk`` does), checks both tables hold the same rows and prints the speedup.
+
+    $ python bench_bulk_load.py --years 8
+"""
+
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import typer
+from sqlalchemy import select
+
+from bulk_load import bulk_load
+from models import OMSolarHourlyWeatherRecord
+from storage import create_backend
+
+app = typer.Typer(help="Benchmark bulk backfills against the normal insert path.")
+
+TABLE = OMSolarHourlyWeatherRecord.__table__
+
+
+def _rows(years: int, first_year: int = 2017) -> list[dict]:
+    dates = pd.date_range(
+        datetime(first_year, 1, 1),
+        datetime(first_year + years, 1, 1),
+        freq="h",
+        inclusive="left",
+    )
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 1000, (len(dates), 5))
+    frame = pd.DataFrame(
+        values,
+        columns=[
+            "shortwave_radiation",
+            "direct_radiation",
+            "diffuse_radiation",
+            "direct_normal_irradiance",
+            "global_tilted_irradiance",
+        ],
+    )
+    frame.insert(0, "date", dates.to_pydatetime())
+    frame.insert(0, "location_id", 1)
+    return frame.to_dict(orient="records")
+
+
+def _load(database_url: str, rows: list[dict], bulk: bool) -> tuple[float, list]:
+    backend = create_backend(database_url)
+    backend.create_schema()
+    started = time.perf_counter()
+    if bulk:
+        bulk_load(TABLE, rows, backend=backend)
+    else:
+        backend.bulk_insert(TABLE, rows)
+    elapsed = time.perf_counter() - started
+    columns = [column for column in TABLE.columns if column.name != "id"]
+    with backend.engine.connect() as conn:
+        stored = conn.execute(select(*columns).order_by(TABLE.c.date)).all()
+    backend.dispose()
+    return elapsed, stored
+
+
+@app.command()
+def run(
+    years: int = typer.Option(8, help="Years of synthetic hourly data"),
+    repeat: int = typer.Option(3, help="Runs per mode; best is reported"),
+):
+    rows = _rows(years)
+    print(f"{len(rows)} hourly rows ({years} years)")
+    best = {}
+    stored = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for run_number in range(repeat):
+            for mode, bulk in (("normal", False), ("bulk", True)):
+                path = os.path.join(directory, f"{mode}-{run_number}.db")
+                elapsed, stored[mode] = _load(f"sqlite:///{path}", rows, bulk)
+                best[mode] = min(best.get(mode, elapsed), elapsed)
+    # Both paths must end with exactly the same rows
+    assert stored["normal"] == stored["bulk"]
+    for mode, seconds in best.items():
+        print(f"{mode:>7}  {seconds:>7.3f}s  {len(rows) / seconds:>10.0f} rows/s")
+    print(f"speedup  {best['normal'] / best['bulk']:.2f}x")
+
+
+if __name__ == "__main__":
+    app()
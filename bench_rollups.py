@@ -0,0 +1,106 @@
+"""Benchmark the parallel rollups in ``rollups.py`` from 1 to N worker processes.
+
+Builds a synthetic SQLite database with ``--years`` years of hourly data,
+times the partitioned aggregation at each worker count, checks that every
+run produces exactly the same daily and monthly rows, and times the single
+writer once at the end.
+
+    $ python bench_rollups.py --years 40 --max-workers 8
+"""
+
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import typer
+from pandas.testing import assert_frame_equal
+
+from models import HourlyWeatherRecord
+from rollups import build_rollups, compute_rollups
+from storage import create_backend
+
+app = typer.Typer(help="Benchmark parallel daily/monthly rollups.")
+
+
+def _populate(database_url: str, years: int, first_year: int = 1990) -> int:
+    backend = create_backend(database_url)
+    backend.create_schema()
+    dates = pd.date_range(
+        datetime(first_year, 1, 1),
+        datetime(first_year + years, 1, 1),
+        freq="h",
+        inclusive="left",
+    )
+    rng = np.random.default_rng(0)
+    hours = np.arange(len(dates))
+    frame = pd.DataFrame(
+        {
+            "location_id": 1,
+            "date": dates.to_pydatetime(),
+            "temperature": 10
+            + 15 * np.sin(hours / 8766 * 2 * np.pi)
+            + rng.normal(0, 3, len(dates)),
+            "precipitation": rng.exponential(0.1, len(dates)),
+            "wind_speed": rng.gamma(2.0, 3.0, len(dates)),
+        }
+    )
+    rows = frame.to_dict(orient="records")
+    table = HourlyWeatherRecord.__table__
+    for offset in range(0, len(rows), 100_000):
+        backend.bulk_insert(table, rows[offset : offset + 100_000])
+    backend.dispose()
+    return len(rows)
+
+
+def _worker_counts(max_workers: int) -> list[int]:
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    return counts
+
+
+@app.command()
+def run(
+    years: int = typer.Option(40, help="Years of synthetic hourly data"),
+    max_workers: int = typer.Option(
+        os.cpu_count() or 1, "-n", "--max-workers", help="Largest worker count"
+    ),
+    repeat: int = typer.Option(3, help="Runs per worker count; best is reported"),
+):
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        rows = _populate(database_url, years)
+        print(f"{rows} hourly rows in {years} (location, year) partitions")
+        print(f"{'workers':>7}  {'seconds':>8}  {'speedup':>7}")
+
+        baseline = reference = None
+        for workers in _worker_counts(max_workers):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = compute_rollups(workers, database_url)
+                timings.append(time.perf_counter() - started)
+            best = min(timings)
+            if reference is None:
+                baseline, reference = best, result
+            else:
+                # Output must not depend on the worker count
+                assert_frame_equal(result[0], reference[0])
+                assert_frame_equal(result[1], reference[1])
+            print(f"{workers:>7}  {best:>8.3f}  {baseline / best:>6.2f}x")
+
+        started = time.perf_counter()
+        daily_rows, monthly_rows = build_rollups(max_workers, database_url)
+        print(
+            f"build_rollups({max_workers}) wrote {daily_rows} daily and "
+            f"{monthly_rows} monthly rows in {time.perf_counter() - started:.3f}s"
+        )
+
+
+if __name__ == "__main__":
+    app()
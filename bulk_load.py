@@ -0,0 +1,110 @@
+"""Bulk backfill into the hourly tables with deferred index builds.
+
+The normal import path inserts into the indexed target table under the
+database's default durability settings. For a backfill into an empty table
+or a new location that is mostly fsyncs and index maintenance, so
+``bulk_load``:
+
+1. relaxes durability on its connection (WAL and ``synchronous=OFF`` on
+   SQLite, ``synchronous_commit=off`` on Postgres);
+2. loads the rows into an unindexed staging table in large transactions;
+3. drops rows whose key is already in the target, then, in one transaction,
+   drops the target's indexes, copies the newest staged row per key across,
+   and recreates the indexes;
+4. runs ``ANALYZE`` once and restores the settings, even if a step failed.
+
+    $ python main.py import-weather-data --bulk
+"""
+
+from collections.abc import Iterable, Iterator
+from itertools import islice
+
+from sqlalchemy import and_, delete, exists, func, insert, inspect, select, text
+from sqlalchemy.schema import Table
+
+from constants import get_backend
+from storage import StorageBackend
+
+BATCH_SIZE = 100_000
+
+
+def unique_key(table: Table) -> list[str]:
+    """Columns identifying a row of ``table`` for deduplication."""
+    for index in table.indexes:
+        if index.unique:
+            return [column.name for column in index.columns]
+    return [column.name for column in table.columns if column.unique]
+
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def bulk_load(
+    table: Table,
+    rows: Iterable[dict],
+    backend: StorageBackend | None = None,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """Load ``rows`` into ``table`` via a staging table; returns rows added."""
+    backend = backend or get_backend()
+    staging = backend.staging_table(table)
+    columns = [column.name for column in staging.columns if column.name != "seq"]
+    key = unique_key(table)
+
+    with backend.engine.connect() as conn, backend.bulk_settings(conn):
+        staging.drop(conn, checkfirst=True)
+        staging.create(conn)
+        conn.commit()
+        try:
+            for batch in _batches(rows, batch_size):
+                backend.bulk_insert(staging, batch, conn=conn)
+                conn.commit()
+
+            if key:
+                # Keys already stored win over the backfill, like the normal path
+                conn.execute(
+                    delete(staging).where(
+                        exists().where(
+                            and_(*(table.c[name] == staging.c[name] for name in key))
+                        )
+                    )
+                )
+                newest = select(func.max(staging.c.seq)).group_by(
+                    *(staging.c[name] for name in key)
+                )
+            else:
+                newest = select(staging.c.seq)
+            conn.commit()
+
+            # Swap the indexes out around the copy in a single transaction so a
+            # failure leaves the target table exactly as it was. Only indexes
+            # that are stored are swapped; ``migrate`` creates missing ones.
+            backend.transactional_ddl(conn)
+            added = conn.execute(
+                select(func.count()).where(staging.c.seq.in_(newest))
+            ).scalar()
+            stored = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+            indexes = [index for index in table.indexes if index.name in stored]
+            for index in indexes:
+                index.drop(conn)
+            conn.execute(
+                insert(table).from_select(
+                    columns,
+                    select(*(staging.c[name] for name in columns))
+                    .where(staging.c.seq.in_(newest))
+                    .order_by(*(staging.c[name] for name in key or ["seq"])),
+                )
+            )
+            for index in indexes:
+                index.create(conn)
+            conn.commit()
+            conn.execute(text(f"ANALYZE {table.name}"))
+            conn.commit()
+        finally:
+            conn.rollback()
+            staging.drop(conn, checkfirst=True)
+            conn.commit()
+    return added
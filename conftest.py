@@ -0,0 +1,74 @@
+import os
+
+import pytest
+from sqlalchemy import insert
+
+import constants
+from models import Base, Location
+from storage import create_backend
+
+# Point this at a scratch Postgres database to run the backend tests there too,
+# e.g. postgresql+psycopg://weather@localhost/weather_test
+POSTGRES_URL = os.environ.get("WEATHER_TEST_POSTGRES_URL")
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def backend(request, tmp_path, monkeypatch):
+    """Empty schema on each storage backend, installed as the configured one."""
+    if request.param == "sqlite":
+        backend = create_backend(f"sqlite:///{tmp_path / 'weather.db'}")
+    elif POSTGRES_URL is None:
+        pytest.skip("WEATHER_TEST_POSTGRES_URL is not set")
+    else:
+        backend = create_backend(POSTGRES_URL)
+        Base.metadata.drop_all(backend.engine)
+    backend.create_schema()
+    monkeypatch.setattr(constants, "_backend", backend)
+    yield backend
+    if request.param != "sqlite":
+        Base.metadata.drop_all(backend.engine)
+    backend.dispose()
+
+
+@pytest.fixture
+def database(backend):
+    """``backend`` with the Lander location the test rows refer to."""
+    with backend.engine.begin() as conn:
+        conn.execute(
+            insert(Location).values(
+                latitude="42.833", longitude="108.7307", friendly_name="Lander"
+            )
+        )
+    return backend
+
+
+@pytest.fixture
+def hourly_rows():
+    """Factory for ``hourly_weather`` rows, one per date.
+
+    ``values`` override a column with one value for every row or one per
+    date. Temperature defaults to the row's position, which makes rows easy
+    to tell apart in assertions.
+    """
+
+    def make(dates, location_id: int = 1, **values) -> list[dict]:
+        dates = list(dates)
+        columns = {
+            "temperature": range(len(dates)),
+            "precipitation": 0.0,
+            "wind_speed": 3.0,
+            **values,
+        }
+        return [
+            {
+                "location_id": location_id,
+                "date": date,
+                **{
+                    name: float(value if isinstance(value, (int, float)) else value[i])
+                    for name, value in columns.items()
+                },
+            }
+            for i, date in enumerate(dates)
+        ]
+
+    return make
@@ -1,10 +1,36 @@
-from sqlalchemy import create_engine
-from os import path
+from os import environ, path
 
 
 LATITUDE: float = 42.8330
 LONGITUDE: float = 108.7307
-ENGINE = create_engine("sqlite:///weather.db")
+# Any SQLAlchemy URL; postgresql:// URLs get the partitioned server backend
+DATABASE_URL = environ.get("WEATHER_DATABASE_URL", "sqlite:///weather.db")
 ROOT_DIR = path.dirname(path.abspath(__file__))
 START_DATE = "2017-01-01"
 END_DATE = "2025-08-02"
+# Local timezone the Open-Meteo archive is queried in
+TIMEZONE = "America/Denver"
+
+_backend = None
+
+
+def get_backend():
+    """Storage backend for DATABASE_URL, created on first use (see storage.py)."""
+    global _backend
+    if _backend is None:
+        from storage import create_backend
+
+        _backend = create_backend(DATABASE_URL)
+    return _backend
+
+
+def get_engine():
+    """Shared engine, created on first use so importing constants stays cheap."""
+    return get_backend().engine
+
+
+def __getattr__(name: str):
+    # ENGINE used to be created at import time; keep it importable, but lazily
+    if name == "ENGINE":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,129 @@
+"""Local load test for the query service in ``query_server.py``.
+
+Starts the server in-process against the configured database (or targets an
+already running one with ``--url``) and hammers the daily/hourly/range/latest
+endpoints from a pool of client threads, then reports throughput, latency
+percentiles and the response cache hit rate.
+
+    $ python load_test.py --requests 5000 --concurrency 16
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from statistics import quantiles
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import typer
+
+from constants import DATABASE_URL, END_DATE, START_DATE
+from query_server import create_server
+
+app = typer.Typer(help="Load test the read-only weather query service.")
+
+
+def _sample_paths(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    start = datetime.strptime(START_DATE, "%Y-%m-%d")
+    days = (datetime.strptime(END_DATE, "%Y-%m-%d") - start).days
+    # A small pool of hot dates mirrors how dashboards repeatedly ask for the
+    # same handful of days
+    hot_days = [start + timedelta(days=rng.randrange(days)) for _ in range(50)]
+    paths = []
+    for _ in range(count):
+        day = rng.choice(hot_days).strftime("%Y-%m-%d")
+        kind = rng.random()
+        if kind < 0.35:
+            paths.append(f"/hourly?date={day}")
+        elif kind < 0.7:
+            paths.append(f"/daily?date={day}")
+        elif kind < 0.9:
+            end = (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=7)).strftime(
+                "%Y-%m-%d"
+            )
+            paths.append(f"/range?table=daily&start={day}&end={end}")
+        else:
+            paths.append(f"/latest?table={rng.choice(['hourly', 'daily'])}")
+    return paths
+
+
+def _fetch(base_url: str, path: str, etags: dict, lock: threading.Lock):
+    headers = {}
+    with lock:
+        if path in etags:
+            headers["If-None-Match"] = etags[path]
+    started = time.perf_counter()
+    try:
+        with urlopen(Request(base_url + path, headers=headers)) as response:
+            response.read()
+            status = response.status
+            etag = response.headers.get("ETag")
+    except HTTPError as error:
+        status = error.code
+        etag = None
+    elapsed = time.perf_counter() - started
+    if etag is not None:
+        with lock:
+            etags[path] = etag
+    return status, elapsed
+
+
+@app.command()
+def run(
+    requests: int = typer.Option(2000, "-n", "--requests", help="Total requests"),
+    concurrency: int = typer.Option(8, "-c", "--concurrency", help="Client threads"),
+    url: str = typer.Option(
+        None, "--url", help="Target a running server instead of starting one"
+    ),
+    database_url: str = typer.Option(
+        DATABASE_URL, "-d", "--database-url", help="Database for in-process server"
+    ),
+    revalidate: bool = typer.Option(
+        True, help="Send If-None-Match for paths seen before"
+    ),
+    seed: int = typer.Option(0, help="Random seed for the request mix"),
+):
+    server = None
+    if url is None:
+        server = create_server(port=0, database_url=database_url)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    paths = _sample_paths(requests, seed)
+    etags: dict = {}
+    lock = threading.Lock()
+    statuses: dict[int, int] = {}
+    latencies = []
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = pool.map(
+            lambda p: _fetch(url, p, etags if revalidate else {}, lock), paths
+        )
+        for status, elapsed in results:
+            statuses[status] = statuses.get(status, 0) + 1
+            latencies.append(elapsed)
+    wall = time.perf_counter() - started
+
+    cuts = quantiles(latencies, n=100)
+    print(f"{requests} requests, {concurrency} threads in {wall:.2f}s")
+    print(f"throughput: {requests / wall:.0f} req/s")
+    print(
+        f"latency ms: p50={cuts[49] * 1000:.2f} p95={cuts[94] * 1000:.2f} "
+        f"p99={cuts[98] * 1000:.2f} max={max(latencies) * 1000:.2f}"
+    )
+    print("status codes: " + ", ".join(f"{k}={v}" for k, v in sorted(statuses.items())))
+    if server is not None:
+        cache = server.service.cache
+        total = cache.hits + cache.misses
+        if total:
+            print(f"response cache hit rate: {cache.hits / total:.1%}")
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    app()
@@ -1,28 +1,27 @@
-from sqlalchemy import insert, select
-from weather_api_importer import (
-    get_hourly_weather_records_by_date,
-    insert_hourly_weather_records,
-)
-
-
-from models import (
-    Base,
-    Location,
-    HourlyWeatherRecord,
-    DailyWeatherRecord,
-)
-import pandas as pd
-import typer
-from constants import ENGINE, START_DATE, END_DATE, LATITUDE, LONGITUDE
 import logging
+import time
 from logging.handlers import RotatingFileHandler
 from datetime import datetime, timedelta
 
+import typer
+from constants import (
+    START_DATE,
+    END_DATE,
+    LATITUDE,
+    LONGITUDE,
+    TIMEZONE,
+    get_backend,
+    get_engine,
+)
+
+# pandas, SQLAlchemy, the models and the Open-Meteo client are imported inside
+# the commands that need them so `--help` and light commands start quickly.
+
 # Configure logging to file with rotation
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 _handler = RotatingFileHandler(
-    "weather_tracking.log", maxBytes=1_000_000, backupCount=3
+    "weather_tracking.log", maxBytes=1_000_000, backupCount=3, delay=True
 )
 _formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 _handler.setFormatter(_formatter)
@@ -37,10 +36,35 @@ app = typer.Typer(
 
 @app.command()
 def migrate():
+    from sqlalchemy import insert, select
+    from models import (
+        DailyWeatherRecord,
+        HourlyObservation,
+        HourlyWeatherRecord,
+        Location,
+        MonthlyWeatherRecord,
+        OMSolarHourlyWeatherRecord,
+    )
+
+    engine = get_engine()
     logger.info("Creating new table schema...")
-    Base.metadata.create_all(ENGINE)
+    backend = get_backend()
+    backend.create_schema()
+    # Tables created by older versions, or before a variable was registered
+    for model in (OMSolarHourlyWeatherRecord, HourlyObservation):
+        for column in backend.add_missing_columns(model.__table__):
+            logger.info(f"Added column {model.__tablename__}.{column}")
+    # Tables from older versions are unique on date alone, not per location
+    for model in (
+        HourlyWeatherRecord,
+        OMSolarHourlyWeatherRecord,
+        DailyWeatherRecord,
+        MonthlyWeatherRecord,
+    ):
+        for key in backend.replace_unique_keys(model.__table__):
+            logger.info(f"Replaced unique key {model.__tablename__}({key})")
     logger.info("Creating location table data")
-    with ENGINE.begin() as conn:  # transactional context
+    with engine.begin() as conn:  # transactional context
         default_location = conn.execute(
             select(Location.id).where(
                 Location.latitude == LATITUDE,
@@ -69,20 +93,50 @@ def import_weather_data(
     end_date: str = typer.Option(
         END_DATE, "-e", "--end-date", help="End date format: YYYY-MM-DD"
     ),
+    validate: bool = typer.Option(
+        True, help="Check for gaps, duplicates and implausible values before insert"
+    ),
+    refetch_gaps: bool = typer.Option(
+        False, "--refetch-gaps", help="Re-request only the missing windows found"
+    ),
+    bulk: bool = typer.Option(
+        False,
+        "--bulk",
+        help="Backfill mode for empty tables or new locations: stage, then index once",
+    ),
 ):
+    import pandas as pd
+    from sqlalchemy import select
+    from models import OMSolarHourlyWeatherRecord
+    from weather_api_importer import (
+        get_hourly_weather_records_by_date,
+        insert_hourly_weather_records,
+    )
+
+    engine = get_engine()
     try:
         start_dt = datetime.strptime(start_date, "%Y-%m-%d")
         end_dt_inclusive = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
     except ValueError:
         logger.error("Invalid date format. Use YYYY-MM-DD for start and end dates.")
         raise
+    # The API is queried in local days but returns (and we store) UTC hours
+    window_start = pd.Timestamp(start_dt, tz=TIMEZONE)
+    window_end = pd.Timestamp(end_dt_inclusive, tz=TIMEZONE)
     logger.info("Importing weather data...")
     existing_ts = set()
-    with ENGINE.connect() as conn:
+    with engine.connect() as conn:
+        # Imported rows land in om_solar_hourly_weather, so dedupe against it
         stmt = (
-            select(HourlyWeatherRecord.date)
-            .where(HourlyWeatherRecord.date >= start_dt)
-            .where(HourlyWeatherRecord.date < end_dt_inclusive)
+            select(OMSolarHourlyWeatherRecord.date)
+            .where(
+                OMSolarHourlyWeatherRecord.date
+                >= window_start.tz_convert(None).to_pydatetime()
+            )
+            .where(
+                OMSolarHourlyWeatherRecord.date
+                < window_end.tz_convert(None).to_pydatetime()
+            )
         )
         result = conn.execute(stmt).scalars().all()
         # Normalize to naive datetimes for consistent comparison (drop tz if present)
@@ -102,6 +156,11 @@ def import_weather_data(
     logger.info("Getting weather records from API")
     records = get_hourly_weather_records_by_date(start_date, end_date)
 
+    if validate:
+        records = _validate_import(
+            records, window_start, window_end, existing_ts, refetch_gaps
+        )
+
     # Filter out records that already exist
     if not records.empty and existing_ts:
         records = records.copy()
@@ -120,19 +179,137 @@ def import_weather_data(
         logger.info("No new hourly weather records to insert.")
         return
 
-    insert_hourly_weather_records(records)
+    started = time.perf_counter()
+    insert_hourly_weather_records(records, bulk=bulk)
+    logger.info(
+        f"Inserted {len(records)} hourly rows{' in bulk mode' if bulk else ''} "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+
+
+def _validate_import(records, window_start, window_end, existing_ts, refetch):
+    """Run the data quality stage over fetched records and return the clean rows."""
+    import pandas as pd
+    from models import OMSolarHourlyWeatherRecord
+    from validation import validate_hourly, record_issues, refetch_gaps
+    from weather_api_importer import get_hourly_weather_records_by_date
+
+    report = validate_hourly(
+        records, start=window_start, end=window_end, existing=existing_ts
+    )
+    if refetch and not report.gaps().empty:
+        logger.info(f"Re-fetching {len(report.gaps())} gap windows from the API")
+        filled = refetch_gaps(report.gaps(), get_hourly_weather_records_by_date)
+        if not filled.empty:
+            logger.info(f"Re-fetch filled {len(filled)} missing hours.")
+            report = validate_hourly(
+                pd.concat([report.clean, filled], ignore_index=True),
+                start=window_start,
+                end=window_end,
+                existing=existing_ts,
+            )
+
+    for issue_type, hours in report.counts().items():
+        logger.warning(f"Data quality: {hours} hours flagged as {issue_type}.")
+    record_issues(
+        report, OMSolarHourlyWeatherRecord.__tablename__, window_start, window_end
+    )
+    return report.clean
+
+
+@app.command()
+def refetch_missing_hours():
+    """Re-request only the gap windows recorded in data_quality_issue."""
+    import pandas as pd
+    from sqlalchemy import select
+    from models import DataQualityIssue, OMSolarHourlyWeatherRecord
+    from validation import record_issues, refetch_gaps, validate_hourly
+    from weather_api_importer import (
+        get_hourly_weather_records_by_date,
+        insert_hourly_weather_records,
+    )
+
+    engine = get_engine()
+    table_name = OMSolarHourlyWeatherRecord.__tablename__
+    with engine.connect() as conn:
+        gaps = pd.read_sql(
+            select(DataQualityIssue).where(
+                DataQualityIssue.table_name == table_name,
+                DataQualityIssue.issue_type == "missing",
+            ),
+            conn,
+        )
+    if gaps.empty:
+        logger.info("No recorded gaps to re-fetch.")
+        return
+
+    filled = refetch_gaps(gaps, get_hourly_weather_records_by_date)
+    if not filled.empty:
+        insert_hourly_weather_records(filled)
+        logger.info(f"Inserted {len(filled)} previously missing hours.")
+
+    # Re-check the gap span against what is now stored
+    window_start = gaps["start"].min()
+    window_end = gaps["end"].max() + timedelta(hours=1)
+    with engine.connect() as conn:
+        stored = (
+            conn.execute(
+                select(OMSolarHourlyWeatherRecord.date)
+                .where(OMSolarHourlyWeatherRecord.date >= window_start)
+                .where(OMSolarHourlyWeatherRecord.date < window_end)
+            )
+            .scalars()
+            .all()
+        )
+    report = validate_hourly(
+        pd.DataFrame({"date": pd.Series([], dtype="datetime64[ns, UTC]")}),
+        start=window_start,
+        end=window_end,
+        existing=stored,
+    )
+    record_issues(
+        report, table_name, window_start, window_end, issue_types=("missing",)
+    )
+    logger.info(f"{int(report.gaps()['row_count'].sum())} hours still missing.")
+
+
+@app.command()
+def copy_hourly_observations():
+    """Copy hourly_weather and om_solar_hourly_weather into hourly_observation."""
+    from observations import copy_legacy_tables
+
+    logger.info("Copying the legacy hourly tables into hourly_observation...")
+    for table_name, rows in copy_legacy_tables().items():
+        logger.info(f"Copied {rows} rows from {table_name}.")
+
+
+@app.command()
+def build_tiles():
+    """Rebuild the chart tiles for every variable from the hourly tables."""
+    from tiles import refresh_tiles
+
+    logger.info("Building chart tiles from all hourly data...")
+    inserted = refresh_tiles()
+    logger.info(f"Inserted {inserted} chart tiles.")
 
 
 @app.command()
 def build_daily_summaries():
     """Build daily_weather from ALL data in hourly_weather using pandas."""
-    DailyWeatherRecord.__table__.drop(ENGINE, checkfirst=True)
-    DailyWeatherRecord.__table__.create(ENGINE, checkfirst=True)
+    import pandas as pd
+    from models import DailyWeatherRecord, DataVersion
+    from rollups import HOURLY_AGGREGATES
+
+    engine = get_engine()
+    DailyWeatherRecord.__table__.drop(engine, checkfirst=True)
+    DailyWeatherRecord.__table__.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        DataVersion.bump(conn)
 
     logger.info("Building daily summaries from all hourly data...")
 
     # Load all hourly data into a DataFrame
-    with ENGINE.connect() as conn:
+    with engine.connect() as conn:
         hourly_df = pd.read_sql(
             "SELECT date, temperature, precipitation, wind_speed FROM hourly_weather",
             conn,
@@ -149,17 +326,7 @@ def build_daily_summaries():
     # Group by day and compute aggregates via pandas
     agg_df = (
         hourly_df.groupby("day")
-        .agg(
-            average_temperature=("temperature", "mean"),
-            min_temperature=("temperature", "min"),
-            max_temperature=("temperature", "max"),
-            average_wind_speed=("wind_speed", "mean"),
-            min_wind_speed=("wind_speed", "min"),
-            max_wind_speed=("wind_speed", "max"),
-            precipitation_sum=("precipitation", "sum"),
-            precipitation_min=("precipitation", "min"),
-            precipitation_max=("precipitation", "max"),
-        )
+        .agg(**HOURLY_AGGREGATES)
         .reset_index()
         .rename(columns={"day": "date_time"})
     )
@@ -195,13 +362,24 @@ def build_daily_summaries():
     ]
 
     records = agg_df.to_dict(orient="records")
-    stmt = insert(DailyWeatherRecord)
-    with ENGINE.begin() as conn:
-        for record in records:
-            conn.execute(stmt, record)
+    inserted = get_backend().bulk_insert(DailyWeatherRecord.__table__, records)
+    with engine.begin() as conn:
+        DataVersion.bump(conn)
+    logger.info(f"Inserted {inserted} daily summary rows.")
+
+
+@app.command()
+def build_rollups(
+    workers: int = typer.Option(
+        None, "-w", "--workers", help="Worker processes (default: one per core)"
+    ),
+):
+    """Rebuild daily_weather and monthly_weather in parallel per location and year."""
+    from rollups import build_rollups as run_rollups
 
-        conn.commit()
-        logger.info(f"Inserted {len(records)} daily summary rows.")
+    logger.info("Building daily and monthly rollups in parallel...")
+    daily_rows, monthly_rows = run_rollups(workers)
+    logger.info(f"Inserted {daily_rows} daily and {monthly_rows} monthly rows.")
 
 
 if __name__ == "__main__":
@@ -1,21 +1,31 @@
 from sqlalchemy import (
+    REAL,
+    Column,
     String,
     Integer,
     Float,
     select,
+    insert,
+    update,
     DateTime,
-    create_engine,
     ForeignKey,
     Date,
+    Index,
+    Table,
     UniqueConstraint,
 )
 from sqlalchemy.orm import DeclarativeBase, mapped_column, Mapped
-import pandas as pd
-from pandas import DataFrame
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta, date, timezone
+from typing import TYPE_CHECKING
 
 from dataclasses import dataclass
 
+from constants import get_engine
+from variables import HOURLY_VARIABLES
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
 
 class Base(DeclarativeBase):
     pass
@@ -23,9 +33,12 @@ class Base(DeclarativeBase):
 
 class MonthlyWeatherRecord(Base):
     __tablename__ = "monthly_weather"
+    __table_args__ = (
+        UniqueConstraint("location_id", "date", name="uq_monthly_weather_date"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     location_id: Mapped[int] = mapped_column(ForeignKey("location.id"))
-    date: Mapped[Date] = mapped_column(Date, unique=True)
+    date: Mapped[Date] = mapped_column(Date)
     month: Mapped[int] = mapped_column(Integer)
     year: Mapped[int] = mapped_column(Integer)
     average_temperature: Mapped[float] = mapped_column(Float, nullable=True)
@@ -41,9 +54,12 @@ class MonthlyWeatherRecord(Base):
 
 class DailyWeatherRecord(Base):
     __tablename__ = "daily_weather"
+    __table_args__ = (
+        UniqueConstraint("location_id", "date_time", name="uq_daily_weather_date"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     location_id: Mapped[int] = mapped_column(ForeignKey("location.id"))
-    date_time: Mapped[DateTime] = mapped_column(DateTime, unique=True)
+    date_time: Mapped[DateTime] = mapped_column(DateTime)
     month: Mapped[int] = mapped_column(Integer)
     day_of_month: Mapped[int] = mapped_column(Integer)
     year: Mapped[int] = mapped_column(Integer)
@@ -58,14 +74,15 @@ class DailyWeatherRecord(Base):
     precipitation_max: Mapped[float] = mapped_column(Float, nullable=True)
 
     @classmethod
-    def get_weather_record_on_date(cls, date: str) -> DataFrame:
+    def get_weather_record_on_date(cls, date: str) -> "DataFrame":
+        import pandas as pd
+
         try:
             formatted_date = datetime.strptime(date, "%Y-%d-%m")
         except ValueError:
             raise ValueError("Invalid date, must be YYYY-MM-DD (%Y-%d-%m")
         stmt = select(cls).where(cls.date_time == formatted_date)
-        engine = create_engine("sqlite:///weather.db")
-        with engine.connect() as cursor:
+        with get_engine().connect() as cursor:
             return pd.DataFrame(cursor.execute(stmt))
 
     @classmethod
@@ -99,16 +116,27 @@ class Location(Base):
 
 class OMSolarHourlyWeatherRecord(Base):
     __tablename__ = "om_solar_hourly_weather"
+    # A named index rather than an inline UNIQUE so bulk loads can defer it
+    __table_args__ = (
+        Index(
+            "ix_om_solar_hourly_weather_location_date",
+            "location_id",
+            "date",
+            unique=True,
+        ),
+    )
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     location_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("location.id"), default=1
     )
-    date: Mapped[DateTime] = mapped_column(DateTime, unique=True)
+    date: Mapped[DateTime] = mapped_column(DateTime)
     shortwave_radiation: Mapped[float] = mapped_column(Float, nullable=True)
     direct_radiation: Mapped[float] = mapped_column(Float, nullable=True)
     diffuse_radiation: Mapped[float] = mapped_column(Float, nullable=True)
     direct_normal_irradiance: Mapped[float] = mapped_column(Float, nullable=True)
     global_tilted_irradiance: Mapped[float] = mapped_column(Float, nullable=True)
+    terrestrial_radiation: Mapped[float] = mapped_column(Float, nullable=True)
 
 
 class OMSolarMonthlyWeatherRecord(Base):
@@ -134,28 +162,131 @@ class OMSolarMonthlyWeatherRecord(Base):
 
 class HourlyWeatherRecord(Base):
     __tablename__ = "hourly_weather"
+    # A named index rather than an inline UNIQUE so bulk loads can defer it
+    __table_args__ = (
+        Index("ix_hourly_weather_location_date", "location_id", "date", unique=True),
+    )
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     location_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("location.id"), default=1
     )
-    date: Mapped[DateTime] = mapped_column(DateTime, unique=True)
+    date: Mapped[DateTime] = mapped_column(DateTime)
     temperature: Mapped[float] = mapped_column(Float)
     precipitation: Mapped[float] = mapped_column(Float)
     wind_speed: Mapped[float] = mapped_column(Float)
 
     @classmethod
-    def get_weather_record_on_date(cls, date: str) -> DataFrame:
+    def get_weather_record_on_date(cls, date: str) -> "DataFrame":
+        import pandas as pd
+
         formatted_date = datetime.strptime(date, "%Y-%m-%d")
         stmt = (
             select(cls)
             .where(cls.date >= formatted_date)
             .where(cls.date < formatted_date + timedelta(1))
         )
-        engine = create_engine("sqlite:///weather.db")
-        with engine.connect() as cursor:
+        with get_engine().connect() as cursor:
             return pd.DataFrame(cursor.execute(stmt))
 
 
+class DataQualityIssue(Base):
+    """One window of consecutive hours that failed a validation check."""
+
+    __tablename__ = "data_quality_issue"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    location_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("location.id"), default=1
+    )
+    table_name: Mapped[str] = mapped_column(String)
+    # missing, duplicate, dst_shift, nan or implausible (see validation.py)
+    issue_type: Mapped[str] = mapped_column(String)
+    column_name: Mapped[str] = mapped_column(String, nullable=True)
+    start: Mapped[DateTime] = mapped_column(DateTime)
+    end: Mapped[DateTime] = mapped_column(DateTime)
+    row_count: Mapped[int] = mapped_column(Integer)
+    detected_at: Mapped[DateTime] = mapped_column(DateTime)
+
+
+class ChartTile(Base):
+    """min/max/mean of one hourly variable over one bucket (see tiles.py)."""
+
+    __tablename__ = "chart_tile"
+    __table_args__ = (
+        UniqueConstraint(
+            "location_id",
+            "variable",
+            "resolution",
+            "bucket_start",
+            name="uq_chart_tile_bucket",
+        ),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    location_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("location.id"), default=1
+    )
+    variable: Mapped[str] = mapped_column(String)
+    # 6h, 1d, 1w or 1M
+    resolution: Mapped[str] = mapped_column(String)
+    bucket_start: Mapped[DateTime] = mapped_column(DateTime)
+    min_value: Mapped[float] = mapped_column(Float, nullable=True)
+    max_value: Mapped[float] = mapped_column(Float, nullable=True)
+    mean_value: Mapped[float] = mapped_column(Float, nullable=True)
+    sample_count: Mapped[int] = mapped_column(Integer)
+
+
+class DataVersion(Base):
+    """Single-row counter bumped by every write the query service serves.
+
+    Writes that only insert older rows (gap refetches, backfills) or rewrite
+    rows in place (rollups, tiles) leave the newest timestamp unchanged, so
+    ETags and response caches are keyed on this counter (see query_server.py).
+    """
+
+    __tablename__ = "data_version"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer)
+    # Naive UTC, like the stored timestamps
+    updated_at: Mapped[DateTime] = mapped_column(DateTime)
+
+    @classmethod
+    def bump(cls, conn) -> None:
+        """Count a write; call it in (or after) the writing transaction."""
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        bumped = conn.execute(
+            update(cls)
+            .where(cls.id == 1)
+            .values(version=cls.version + 1, updated_at=now)
+        ).rowcount
+        if not bumped:
+            conn.execute(insert(cls).values(id=1, version=1, updated_at=now))
+
+
+class HourlyObservation(Base):
+    """Every registered hourly variable for one location and UTC hour.
+
+    ``hour`` counts hours since 1970-01-01 UTC. The columns come from
+    ``variables.HOURLY_VARIABLES``; ``migrate`` adds any that are missing. On
+    SQLite the table is WITHOUT ROWID, clustered on the primary key, so there
+    is no separate rowid or date index per row (see observations.py).
+    """
+
+    __table__ = Table(
+        "hourly_observation",
+        Base.metadata,
+        Column(
+            "location_id",
+            Integer,
+            ForeignKey("location.id"),
+            primary_key=True,
+            autoincrement=False,
+        ),
+        Column("hour", Integer, primary_key=True, autoincrement=False),
+        *(Column(variable.name, REAL) for variable in HOURLY_VARIABLES),
+        sqlite_with_rowid=False,
+    )
+
+
 class NOAAStationMonthlySummary(Base):
     __tablename__ = "noaa_monthly_summary"
     __table_args__ = (
@@ -303,7 +434,9 @@ class DailyWeatherRecordInstance:
     precipitation_max: float
 
     @classmethod
-    def to_dataframe(cls) -> DataFrame:
+    def to_dataframe(cls) -> "DataFrame":
+        from pandas import DataFrame
+
         return DataFrame(cls)
 
 
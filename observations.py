@@ -0,0 +1,131 @@
+"""Reads and writes of the compact ``hourly_observation`` table.
+
+``hourly_observation`` holds one row per location and UTC hour with a REAL
+column per registered variable (``variables.py``), keyed by integer epoch
+hours. Temperature, wind, radiation and soil temperatures for an hour live in
+the same row, so reading them together needs no join, and each row carries
+one small key instead of an id, a location, a timestamp and an index entry
+per legacy table.
+
+The importer writes every fetched variable here. Existing data is copied over
+from ``hourly_weather`` and ``om_solar_hourly_weather`` with:
+
+    $ python main.py copy-hourly-observations
+
+Tiles, rollups, the query service and the memory store still read the
+legacy tables; imports only add to ``om_solar_hourly_weather`` there.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from sqlalchemy import MetaData, Table, select
+from sqlalchemy.engine import Engine
+
+from constants import get_backend, get_engine
+from models import HourlyObservation
+from storage import StorageBackend
+from variables import REGISTRY
+
+TABLE = HourlyObservation.__table__
+
+
+def to_epoch_hours(dates) -> np.ndarray:
+    """Whole hours since 1970-01-01 UTC; naive timestamps are taken as UTC."""
+    dates = pd.to_datetime(pd.Series(dates))
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert("UTC").dt.tz_localize(None)
+    return dates.to_numpy(dtype="datetime64[h]").astype(np.int64)
+
+
+def from_epoch_hours(hours) -> pd.Series:
+    """Naive UTC timestamps for epoch hours."""
+    return pd.Series(pd.to_datetime(np.asarray(hours, dtype=np.int64), unit="h"))
+
+
+def observation_rows(frame: DataFrame, location_id: int = 1) -> list[dict]:
+    """Rows for ``hourly_observation`` from a ``date`` + variables frame.
+
+    A ``location_id`` column in ``frame`` takes precedence over the argument.
+    Columns that are not variables of the table are ignored.
+    """
+    columns = [name for name in frame.columns if name in TABLE.c and name != "hour"]
+    rows = frame[columns].astype(object).where(frame[columns].notna(), None)
+    if "location_id" not in rows.columns:
+        rows.insert(0, "location_id", location_id)
+    rows.insert(1, "hour", to_epoch_hours(frame["date"]))
+    return rows.to_dict(orient="records")
+
+
+def write_observations(
+    frame: DataFrame, location_id: int = 1, backend: StorageBackend | None = None
+) -> int:
+    """Upsert the variables in ``frame``; other stored variables are kept."""
+    if frame.empty:
+        return 0
+    return (backend or get_backend()).upsert(
+        TABLE, observation_rows(frame, location_id)
+    )
+
+
+def read_observations(
+    variables: list[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    location_id: int = 1,
+    engine: Engine | None = None,
+) -> DataFrame:
+    """``date`` (naive UTC) plus the requested variables over ``[start, end)``."""
+    variables = variables or [
+        column.name for column in TABLE.columns if not column.primary_key
+    ]
+    unknown = [name for name in variables if name not in TABLE.c]
+    if unknown:
+        raise ValueError(f"Unknown variables: {', '.join(unknown)}")
+    stmt = select(TABLE.c.hour, *(TABLE.c[name] for name in variables)).where(
+        TABLE.c.location_id == location_id
+    )
+    if start is not None:
+        stmt = stmt.where(TABLE.c.hour >= int(to_epoch_hours([start])[0]))
+    if end is not None:
+        stmt = stmt.where(TABLE.c.hour < int(to_epoch_hours([end])[0]))
+    with (engine or get_engine()).connect() as conn:
+        frame = pd.read_sql(stmt.order_by(TABLE.c.hour), conn)
+    frame.insert(0, "date", from_epoch_hours(frame.pop("hour")))
+    return frame
+
+
+def copy_legacy_tables(
+    backend: StorageBackend | None = None, chunk_size: int = 50_000
+) -> dict[str, int]:
+    """Upsert the legacy hourly tables into ``hourly_observation``.
+
+    Which legacy column feeds which variable comes from the registry, so
+    re-running the copy is safe and only overwrites those variables.
+    """
+    backend = backend or get_backend()
+    sources = defaultdict(dict)
+    for variable in REGISTRY.values():
+        if variable.legacy and variable.name in TABLE.c:
+            table_name, column = variable.legacy
+            sources[table_name][column] = variable.name
+
+    copied = {}
+    for table_name, renames in sources.items():
+        # Reflect the stored table: older databases may lack model columns
+        table = Table(table_name, MetaData(), autoload_with=backend.engine)
+        columns = [column for column in renames if column in table.c]
+        stmt = select(table.c.location_id, table.c.date, *(table.c[c] for c in columns))
+        # Read everything first: SQLite can't commit the upserts while a
+        # cursor on the same file is still open
+        with backend.engine.connect() as conn:
+            legacy = pd.read_sql(stmt, conn).rename(columns=renames)
+        rows = observation_rows(legacy)
+        copied[table_name] = sum(
+            backend.upsert(TABLE, rows[offset : offset + chunk_size])
+            for offset in range(0, len(rows), chunk_size)
+        )
+    return copied
@@ -0,0 +1,426 @@
+"""Read-only HTTP query service over the weather tables.
+
+Serves the same queries the dashboards used to run by hand against
+the weather database (see ``Demo.py``) as JSON:
+
+    GET /daily?date=YYYY-MM-DD
+    GET /hourly?date=YYYY-MM-DD
+    GET /range?table=hourly|solar|daily&start=YYYY-MM-DD&end=YYYY-MM-DD
+    GET /latest?table=hourly|solar|daily
+    GET /recent?table=hourly|solar|daily&count=48  (1 to MAX_RECENT rows)
+    GET /series?variable=temperature&start=YYYY-MM-DD&end=YYYY-MM-DD&width=800
+
+Responses carry an ETag and Last-Modified header keyed on the data version
+(see ``models.DataVersion``), so clients can revalidate cheaply, and rendered
+bodies are kept in an in-memory LRU cache until data is written. With ``--memory-days`` the
+latest days of every series are also kept in a ``TimeSeriesStore`` that
+answers /latest, /recent and recent /range queries without the database.
+
+Run it with:
+
+    $ python query_server.py serve --port 8080
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import sha1
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import typer
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+
+from constants import DATABASE_URL
+from models import (
+    DailyWeatherRecord,
+    DataVersion,
+    HourlyWeatherRecord,
+    OMSolarHourlyWeatherRecord,
+)
+from storage import create_backend
+from tiles import get_series
+from timeseries_store import TimeSeriesStore
+
+# table name accepted on the query string -> (model, timestamp column)
+TABLES = {
+    "hourly": (HourlyWeatherRecord, HourlyWeatherRecord.date),
+    "solar": (OMSolarHourlyWeatherRecord, OMSolarHourlyWeatherRecord.date),
+    "daily": (DailyWeatherRecord, DailyWeatherRecord.date_time),
+}
+
+# Largest /recent count answered; a bit over a year of hourly rows
+MAX_RECENT = 10_000
+
+app = typer.Typer(help="Read-only HTTP query service over the weather tables.")
+logger = logging.getLogger(__name__)
+
+
+class QueryError(Exception):
+    """Raised for a bad request; carries the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def create_read_only_engine(url: str = DATABASE_URL, pool_size: int = 8) -> Engine:
+    """Pooled engine whose connections cannot write to the database."""
+    return create_backend(url).read_only_engine(pool_size)
+
+
+def _parse_date(value: str | None, name: str) -> datetime:
+    if value is None:
+        raise QueryError(f"Missing required parameter '{name}'")
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise QueryError(f"Invalid {name} '{value}', must be YYYY-MM-DD")
+
+
+def _to_json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _rows_to_json(rows) -> list[dict]:
+    return [
+        {key: _to_json_value(value) for key, value in row._mapping.items()}
+        for row in rows
+    ]
+
+
+def _frame_to_json(frame) -> list[dict]:
+    return [
+        {key: _to_json_value(value) for key, value in record.items()}
+        for record in frame.to_dict(orient="records")
+    ]
+
+
+class ResponseCache:
+    """Thread-safe LRU of rendered response bodies for a single data version."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, key: str) -> bytes | None:
+        with self._lock:
+            if version != self._version:
+                # New data was ingested; everything cached so far is stale
+                self._entries.clear()
+                self._version = version
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, version, key: str, body: bytes) -> None:
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class WeatherQueryService:
+    """Answers query requests; independent of the HTTP transport."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        cache_size: int = 256,
+        version_ttl: float = 1.0,
+        store: TimeSeriesStore | None = None,
+    ):
+        self.engine = engine
+        self.store = store
+        self.cache = ResponseCache(cache_size)
+        # How long the latest ingested timestamp is trusted before re-checking
+        self.version_ttl = version_ttl
+        self._version = None
+        self._modified = None
+        self._version_checked = 0.0
+        self._version_lock = threading.Lock()
+
+    def data_version(self) -> tuple[tuple, datetime | None]:
+        """``(version, last_modified)`` of the served tables, cached briefly.
+
+        The version is the ``data_version`` counter that writers bump plus the
+        highest id per table, so rows inserted by tools that do not bump the
+        counter still change it. ``last_modified`` is the time of the last
+        counted write, or the newest stored timestamp before any was counted.
+        """
+        now = time.monotonic()
+        with self._version_lock:
+            if now - self._version_checked < self.version_ttl:
+                return self._version, self._modified
+            counter = select(DataVersion).where(DataVersion.id == 1)
+            stmt = select(
+                counter.with_only_columns(DataVersion.version).scalar_subquery(),
+                counter.with_only_columns(DataVersion.updated_at).scalar_subquery(),
+                *(
+                    select(func.max(model.id)).scalar_subquery()
+                    for model, _ in TABLES.values()
+                ),
+                *(
+                    select(func.max(column)).scalar_subquery()
+                    for _, column in TABLES.values()
+                ),
+            )
+            with self.engine.connect() as conn:
+                values = conn.execute(stmt).one()
+            counter_value, updated_at = values[:2]
+            ids, timestamps = values[2 : 2 + len(TABLES)], values[2 + len(TABLES) :]
+            timestamps = [value for value in timestamps if value is not None]
+            version = (counter_value, *ids)
+            if self.store is not None and version != self._version:
+                # Writes may fill gaps inside the buffered window; reload it all
+                self.store.warm_up(self.engine)
+            self._version = version
+            self._modified = updated_at or (max(timestamps) if timestamps else None)
+            self._version_checked = now
+            return self._version, self._modified
+
+    def _stored_location(self, table: str, count: int = 1) -> int | None:
+        """Location the memory store can answer for, or None to ask the database.
+
+        The database queries span every location, so the store only stands in
+        while it buffers a single one, and only for as many rows as it holds.
+        """
+        if self.store is None:
+            return None
+        buffered = self.store.buffered(table)
+        if len(buffered) != 1:
+            return None
+        ((location_id, rows),) = buffered.items()
+        return location_id if count <= rows else None
+
+    def _query(self, endpoint: str, params: dict) -> list[dict] | dict:
+        if endpoint == "series":
+            return self._series(params)
+        if endpoint == "daily":
+            day = _parse_date(params.get("date"), "date")
+            stmt = select(DailyWeatherRecord).where(
+                DailyWeatherRecord.date_time >= day,
+                DailyWeatherRecord.date_time < day + timedelta(days=1),
+            )
+        elif endpoint == "hourly":
+            day = _parse_date(params.get("date"), "date")
+            stmt = (
+                select(HourlyWeatherRecord)
+                .where(HourlyWeatherRecord.date >= day)
+                .where(HourlyWeatherRecord.date < day + timedelta(days=1))
+                .order_by(HourlyWeatherRecord.date)
+            )
+        elif endpoint in ("range", "latest", "recent"):
+            table = params.get("table", "hourly")
+            if table not in TABLES:
+                raise QueryError(
+                    f"Unknown table '{table}', expected one of {', '.join(TABLES)}"
+                )
+            model, column = TABLES[table]
+            if endpoint == "range":
+                start = _parse_date(params.get("start"), "start")
+                end = _parse_date(params.get("end"), "end") + timedelta(days=1)
+                if end <= start:
+                    raise QueryError("'end' must not be before 'start'")
+                location_id = self._stored_location(table)
+                if location_id is not None:
+                    frame = self.store.range(table, start, end, location_id)
+                    if frame is not None:
+                        return _frame_to_json(frame)
+                stmt = (
+                    select(model)
+                    .where(column >= start)
+                    .where(column < end)
+                    .order_by(column)
+                )
+            else:
+                count = 1
+                if endpoint == "recent":
+                    try:
+                        count = int(params.get("count", 24))
+                    except ValueError:
+                        raise QueryError("'count' must be a number of rows")
+                    if not 1 <= count <= MAX_RECENT:
+                        raise QueryError(f"'count' must be between 1 and {MAX_RECENT}")
+                location_id = self._stored_location(table, count)
+                if location_id is not None:
+                    # The store is kept at least as fresh as the version
+                    frame = self.store.last(table, count, location_id)
+                    return list(reversed(_frame_to_json(frame)))
+                stmt = select(model).order_by(column.desc()).limit(count)
+        else:
+            raise QueryError(f"Unknown endpoint '/{endpoint}'", status=404)
+
+        with self.engine.connect() as conn:
+            return _rows_to_json(conn.execute(stmt))
+
+    def _series(self, params: dict) -> dict:
+        """Min/max/mean buckets sized to the chart width (see tiles.py)."""
+        start = _parse_date(params.get("start"), "start")
+        end = _parse_date(params.get("end"), "end") + timedelta(days=1)
+        if end <= start:
+            raise QueryError("'end' must not be before 'start'")
+        try:
+            width = int(params.get("width", 800))
+        except ValueError:
+            raise QueryError("'width' must be a number of pixels")
+        try:
+            resolution, buckets = get_series(
+                params.get("variable", "temperature"),
+                start,
+                end,
+                width,
+                engine=self.engine,
+            )
+        except ValueError as error:
+            raise QueryError(str(error))
+        return {
+            "resolution": resolution,
+            "buckets": [
+                {key: _to_json_value(value) for key, value in bucket.items()}
+                for bucket in buckets.to_dict(orient="records")
+            ],
+        }
+
+    def handle(
+        self, raw_path: str, headers: dict | None = None
+    ) -> tuple[int, dict, bytes]:
+        """Return ``(status, headers, body)`` for a GET of ``raw_path``."""
+        headers = headers or {}
+        url = urlparse(raw_path)
+        endpoint = url.path.strip("/")
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        cache_key = endpoint + "?" + "&".join(
+            f"{key}={params[key]}" for key in sorted(params)
+        )
+
+        version, modified = self.data_version()
+        etag = '"{}"'.format(sha1(f"{version}|{cache_key}".encode()).hexdigest()[:20])
+        response_headers = {
+            "Content-Type": "application/json",
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+        }
+        if modified is not None:
+            last_modified = modified.replace(tzinfo=timezone.utc, microsecond=0)
+            response_headers["Last-Modified"] = format_datetime(
+                last_modified, usegmt=True
+            )
+
+        if_none_match = headers.get("If-None-Match")
+        if if_none_match is not None:
+            if etag in (tag.strip() for tag in if_none_match.split(",")):
+                return 304, response_headers, b""
+        elif modified is not None and headers.get("If-Modified-Since"):
+            try:
+                since = parsedate_to_datetime(headers["If-Modified-Since"])
+            except (TypeError, ValueError):
+                since = None
+            if since is not None and since.tzinfo is None:
+                # "-0000" parses to a naive datetime; HTTP dates are always GMT
+                since = since.replace(tzinfo=timezone.utc)
+            if since is not None and last_modified <= since:
+                return 304, response_headers, b""
+
+        body = self.cache.get(version, cache_key)
+        if body is None:
+            try:
+                payload = self._query(endpoint, params)
+            except QueryError as error:
+                body = json.dumps({"error": str(error)}).encode()
+                return error.status, {"Content-Type": "application/json"}, body
+            body = json.dumps(payload).encode()
+            self.cache.put(version, cache_key, body)
+        return 200, response_headers, body
+
+
+def make_handler(service: WeatherQueryService) -> type[BaseHTTPRequestHandler]:
+    class WeatherQueryHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            try:
+                status, headers, body = service.handle(self.path, dict(self.headers))
+            except Exception:
+                logger.exception("Error handling %s", self.path)
+                status, headers = 500, {"Content-Type": "application/json"}
+                body = json.dumps({"error": "Internal server error"}).encode()
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return WeatherQueryHandler
+
+
+def create_server(
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    database_url: str = DATABASE_URL,
+    pool_size: int = 8,
+    cache_size: int = 256,
+    memory_days: int = 0,
+) -> ThreadingHTTPServer:
+    engine = create_read_only_engine(database_url, pool_size=pool_size)
+    store = TimeSeriesStore(memory_days).warm_up(engine) if memory_days else None
+    service = WeatherQueryService(engine, cache_size=cache_size, store=store)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.service = service
+    return server
+
+
+@app.command()
+def serve(
+    host: str = typer.Option("127.0.0.1", "--host", help="Interface to bind"),
+    port: int = typer.Option(8080, "-p", "--port", help="Port to listen on"),
+    database_url: str = typer.Option(
+        DATABASE_URL, "-d", "--database-url", help="SQLAlchemy database URL"
+    ),
+    pool_size: int = typer.Option(8, "--pool-size", help="Pooled DB connections"),
+    cache_size: int = typer.Option(
+        256, "--cache-size", help="Cached responses to keep in memory"
+    ),
+    memory_days: int = typer.Option(
+        0, "--memory-days", help="Days per series to answer from memory (0: off)"
+    ),
+):
+    server = create_server(
+        host, port, database_url, pool_size, cache_size, memory_days
+    )
+    print(f"Serving {database_url} read-only on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    app()
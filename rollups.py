@@ -0,0 +1,154 @@
+"""Parallel daily and monthly rollups of ``hourly_weather``.
+
+The hourly table is split into independent ``(location_id, year)``
+partitions - no day or month crosses a year boundary - and each partition is
+read and aggregated in its own worker process. The results are merged in
+partition order and written by the parent process in a single transaction,
+so the output does not depend on the number of workers or on which worker
+finishes first.
+
+    $ python main.py build-rollups --workers 8
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+from pandas import DataFrame
+from sqlalchemy import extract, insert, select
+
+from constants import DATABASE_URL
+from models import (
+    DailyWeatherRecord,
+    DataVersion,
+    HourlyWeatherRecord,
+    MonthlyWeatherRecord,
+)
+from storage import create_backend
+
+# Output column -> (hourly column, aggregation); shared by daily and monthly
+HOURLY_AGGREGATES = {
+    "average_temperature": ("temperature", "mean"),
+    "min_temperature": ("temperature", "min"),
+    "max_temperature": ("temperature", "max"),
+    "average_wind_speed": ("wind_speed", "mean"),
+    "min_wind_speed": ("wind_speed", "min"),
+    "max_wind_speed": ("wind_speed", "max"),
+    "precipitation_sum": ("precipitation", "sum"),
+    "precipitation_min": ("precipitation", "min"),
+    "precipitation_max": ("precipitation", "max"),
+}
+
+# One engine per worker process, keyed by URL
+_engines = {}
+
+
+def _engine(database_url: str):
+    if database_url not in _engines:
+        _engines[database_url] = create_backend(database_url).engine
+    return _engines[database_url]
+
+
+def _init_worker():
+    # Pooled connections inherited from the parent over fork must not be reused
+    for engine in _engines.values():
+        engine.dispose(close=False)
+    _engines.clear()
+
+
+def partitions(database_url: str = DATABASE_URL) -> list[tuple[int, int]]:
+    """Sorted ``(location_id, year)`` pairs present in hourly_weather."""
+    year = extract("year", HourlyWeatherRecord.date)
+    stmt = select(HourlyWeatherRecord.location_id, year).distinct()
+    with _engine(database_url).connect() as conn:
+        return sorted((int(loc), int(yr)) for loc, yr in conn.execute(stmt))
+
+
+def aggregate_partition(
+    database_url: str, location_id: int, year: int
+) -> tuple[DataFrame, DataFrame]:
+    """Daily and monthly rows for one location and year."""
+    stmt = (
+        select(
+            HourlyWeatherRecord.date,
+            HourlyWeatherRecord.temperature,
+            HourlyWeatherRecord.precipitation,
+            HourlyWeatherRecord.wind_speed,
+        )
+        .where(HourlyWeatherRecord.location_id == location_id)
+        .where(HourlyWeatherRecord.date >= datetime(year, 1, 1))
+        .where(HourlyWeatherRecord.date < datetime(year + 1, 1, 1))
+    )
+    with _engine(database_url).connect() as conn:
+        hourly = pd.read_sql(stmt, conn)
+    hourly["date"] = pd.to_datetime(hourly["date"])
+
+    daily = (
+        hourly.groupby(hourly["date"].dt.normalize().rename("date_time"))
+        .agg(**HOURLY_AGGREGATES)
+        .reset_index()
+    )
+    daily.insert(0, "location_id", location_id)
+    daily["month"] = daily["date_time"].dt.month
+    daily["day_of_month"] = daily["date_time"].dt.day
+    daily["year"] = daily["date_time"].dt.year
+
+    month_start = hourly["date"].dt.to_period("M").dt.start_time.rename("date")
+    monthly = hourly.groupby(month_start).agg(**HOURLY_AGGREGATES).reset_index()
+    monthly.insert(0, "location_id", location_id)
+    monthly["month"] = monthly["date"].dt.month
+    monthly["year"] = monthly["date"].dt.year
+    monthly["date"] = monthly["date"].dt.date
+    return daily, monthly
+
+
+def _aggregate(args: tuple[str, int, int]) -> tuple[DataFrame, DataFrame]:
+    return aggregate_partition(*args)
+
+
+def compute_rollups(
+    workers: int | None = None, database_url: str = DATABASE_URL
+) -> tuple[DataFrame, DataFrame]:
+    """Aggregate every partition, using ``workers`` processes (default: all cores)."""
+    workers = workers or os.cpu_count() or 1
+    tasks = [(database_url, loc, yr) for loc, yr in partitions(database_url)]
+    if not tasks:
+        return DataFrame(), DataFrame()
+    if workers == 1:
+        results = list(map(_aggregate, tasks))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(tasks)), initializer=_init_worker
+        ) as pool:
+            # map() yields in submission order, keeping the merge deterministic
+            results = list(pool.map(_aggregate, tasks))
+    daily = pd.concat([daily for daily, _ in results], ignore_index=True)
+    monthly = pd.concat([monthly for _, monthly in results], ignore_index=True)
+    return daily, monthly
+
+
+def build_rollups(
+    workers: int | None = None, database_url: str = DATABASE_URL
+) -> tuple[int, int]:
+    """Rebuild daily_weather and monthly_weather; returns the row counts.
+
+    Both tables are dropped and recreated, so databases created before they
+    were keyed on ``(location_id, date)`` pick up the new unique constraints.
+    """
+    daily, monthly = compute_rollups(workers, database_url)
+    engine = _engine(database_url)
+    # Single writer: replace both tables in one transaction
+    with engine.begin() as conn:
+        create_backend(database_url).transactional_ddl(conn)
+        for table in (DailyWeatherRecord.__table__, MonthlyWeatherRecord.__table__):
+            table.drop(conn, checkfirst=True)
+            table.create(conn)
+        if not daily.empty:
+            conn.execute(insert(DailyWeatherRecord), daily.to_dict(orient="records"))
+        if not monthly.empty:
+            conn.execute(
+                insert(MonthlyWeatherRecord), monthly.to_dict(orient="records")
+            )
+        DataVersion.bump(conn)
+    return len(daily), len(monthly)
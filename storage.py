@@ -0,0 +1,478 @@
+"""Storage backends for the weather tables.
+
+The backend is picked from the database URL (``WEATHER_DATABASE_URL``, see
+``constants.py``):
+
+* ``sqlite:///weather.db`` - the default single-file database.
+* ``postgresql://...`` - a server database where the hourly tables are
+  range-partitioned by year on ``date`` (the layout TimescaleDB hypertables
+  use) and bulk loads go through ``COPY``, so concurrent importers and readers
+  no longer queue behind SQLite's single writer lock.
+
+Everything else talks to the database through ``constants.get_engine()`` or
+``constants.get_backend()`` and does not care which one is configured.
+"""
+
+import csv
+import io
+import math
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    Table,
+    UniqueConstraint,
+    create_engine,
+    delete,
+    insert,
+    inspect,
+    text,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine, make_url
+
+from constants import START_DATE
+from models import Base, HourlyWeatherRecord, OMSolarHourlyWeatherRecord
+
+
+class StorageBackend:
+    """Plain SQLAlchemy storage; works with any dialect SQLAlchemy supports."""
+
+    # CREATE TABLE prefixes for throwaway staging tables (see bulk_load.py)
+    STAGING_PREFIXES: tuple[str, ...] = ()
+    # Dialect insert() supporting ON CONFLICT, if the dialect has one
+    UPSERT_INSERT = None
+
+    def __init__(self, url: str):
+        self.url = url
+        self._engine = None
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            self._engine = create_engine(self.url, **self.engine_options())
+        return self._engine
+
+    def engine_options(self) -> dict:
+        return {}
+
+    def read_only_engine(self, pool_size: int = 8) -> Engine:
+        """Separate pooled engine for readers such as the query service."""
+        return create_engine(self.url, pool_size=pool_size, max_overflow=0)
+
+    def create_schema(self, metadata: MetaData = Base.metadata) -> None:
+        metadata.create_all(self.engine)
+
+    def add_missing_columns(self, table: Table) -> list[str]:
+        """``ALTER TABLE ... ADD COLUMN`` for columns the stored table lacks."""
+        existing = {
+            column["name"] for column in inspect(self.engine).get_columns(table.name)
+        }
+        added = []
+        with self.engine.begin() as conn:
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=self.engine.dialect)
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ADD COLUMN {column.name} {column_type}"
+                    )
+                )
+                added.append(column.name)
+        return added
+
+    def _stale_unique_keys(self, table: Table) -> tuple[list[dict], list[dict]]:
+        """Stored unique constraints and indexes the model does not declare."""
+        inspector = inspect(self.engine)
+        if not inspector.has_table(table.name):
+            return [], []
+        declared = {
+            tuple(column.name for column in key.columns)
+            for key in [*table.indexes, *table.constraints]
+            if isinstance(key, UniqueConstraint) or getattr(key, "unique", False)
+        }
+        constraints = [
+            constraint
+            for constraint in inspector.get_unique_constraints(table.name)
+            if tuple(constraint["column_names"]) not in declared
+        ]
+        indexes = [
+            index
+            for index in inspector.get_indexes(table.name)
+            if index["unique"]
+            and tuple(index["column_names"]) not in declared
+            # Dropped together with the constraint it backs
+            and "duplicates_constraint" not in index
+        ]
+        return constraints, indexes
+
+    def replace_unique_keys(self, table: Table) -> list[str]:
+        """Drop stored unique keys ``table`` no longer declares; add its own.
+
+        Returns the column lists of the keys that were dropped.
+        """
+        constraints, indexes = self._stale_unique_keys(table)
+        with self.engine.begin() as conn:
+            for constraint in constraints:
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"DROP CONSTRAINT {constraint['name']}"
+                    )
+                )
+            for index in indexes:
+                conn.execute(text(f"DROP INDEX {index['name']}"))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        return [", ".join(key["column_names"]) for key in [*constraints, *indexes]]
+
+    def upsert(self, table: Table, rows: list[dict]) -> int:
+        """Insert ``rows``, overwriting the given columns of rows already stored.
+
+        Rows are matched on the primary key; columns missing from ``rows`` keep
+        their stored values.
+        """
+        if not rows:
+            return 0
+        key = [column.name for column in table.primary_key.columns]
+        values = [name for name in rows[0] if name in table.c and name not in key]
+        with self.engine.begin() as conn:
+            if self.UPSERT_INSERT is None:
+                # Portable fallback; replaces whole rows
+                for row in rows:
+                    conn.execute(
+                        delete(table).where(
+                            *(table.c[name] == row[name] for name in key)
+                        )
+                    )
+                conn.execute(insert(table), rows)
+                return len(rows)
+            stmt = self.UPSERT_INSERT(table)
+            if values:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=key,
+                    set_={name: stmt.excluded[name] for name in values},
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=key)
+            conn.execute(stmt, rows)
+        return len(rows)
+
+    def bulk_insert(
+        self, table: Table, rows: list[dict], conn: Connection | None = None
+    ) -> int:
+        """Insert ``rows`` into ``table`` in a single transaction.
+
+        With ``conn`` the rows are written in the caller's transaction instead.
+        """
+        if not rows:
+            return 0
+        if conn is not None:
+            conn.execute(insert(table), rows)
+            return len(rows)
+        with self.engine.begin() as conn:
+            conn.execute(insert(table), rows)
+        return len(rows)
+
+    def staging_table(self, table: Table) -> Table:
+        """Unindexed, unconstrained copy of ``table`` to bulk load into.
+
+        ``seq`` records load order so later duplicates can win.
+        """
+        columns = [
+            Column(column.name, column.type)
+            for column in table.columns
+            if not column.primary_key
+        ]
+        return Table(
+            f"{table.name}_staging",
+            MetaData(),
+            Column("seq", Integer, primary_key=True, autoincrement=True),
+            *columns,
+            prefixes=list(self.STAGING_PREFIXES),
+        )
+
+    @contextmanager
+    def bulk_settings(self, conn: Connection):
+        """Relax durability on ``conn`` for a bulk load; no-op by default."""
+        yield
+
+    def transactional_ddl(self, conn: Connection) -> None:
+        """Make DDL on ``conn`` roll back with its transaction from here on.
+
+        Call it before the first statement of the transaction. A no-op where
+        the driver already runs DDL inside the transaction, as on Postgres.
+        """
+
+    def dispose(self) -> None:
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
+
+
+class SQLiteBackend(StorageBackend):
+    UPSERT_INSERT = staticmethod(sqlite.insert)
+
+    def engine_options(self) -> dict:
+        # Wait for a concurrent writer instead of failing with "database is locked"
+        return {"connect_args": {"timeout": 30}}
+
+    @contextmanager
+    def bulk_settings(self, conn: Connection):
+        """WAL and no fsync per commit while loading; restored afterwards.
+
+        A crash mid-load can lose the staged rows but not corrupt the file,
+        and the target table is only written in the final transaction.
+        """
+        journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+        synchronous = conn.exec_driver_sql("PRAGMA synchronous").scalar()
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        conn.exec_driver_sql("PRAGMA temp_store=MEMORY")
+        try:
+            yield
+        finally:
+            # Pragmas cannot change the journal mode inside a transaction
+            conn.rollback()
+            conn.exec_driver_sql(f"PRAGMA synchronous={int(synchronous)}")
+            conn.exec_driver_sql(f"PRAGMA journal_mode={journal_mode}")
+            conn.exec_driver_sql("PRAGMA temp_store=DEFAULT")
+
+    def replace_unique_keys(self, table: Table) -> list[str]:
+        """Rebuild ``table`` when it has unique keys the model no longer declares.
+
+        SQLite cannot drop the index behind an inline ``UNIQUE``, so the rows
+        are copied into a freshly created table instead.
+        """
+        constraints, indexes = self._stale_unique_keys(table)
+        if not constraints and not indexes:
+            return super().replace_unique_keys(table)
+        inspector = inspect(self.engine)
+        stored = {column["name"] for column in inspector.get_columns(table.name)}
+        columns = ", ".join(
+            column.name for column in table.columns if column.name in stored
+        )
+        with self.engine.begin() as conn:
+            self.transactional_ddl(conn)
+            # The renamed table keeps its index names; free them for the new one
+            for index in inspector.get_indexes(table.name):
+                conn.execute(text(f"DROP INDEX {index['name']}"))
+            conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {table.name}_old"))
+            table.create(conn)
+            conn.execute(
+                text(
+                    f"INSERT INTO {table.name} ({columns}) "
+                    f"SELECT {columns} FROM {table.name}_old"
+                )
+            )
+            conn.execute(text(f"DROP TABLE {table.name}_old"))
+        return [", ".join(key["column_names"]) for key in [*constraints, *indexes]]
+
+    def transactional_ddl(self, conn: Connection) -> None:
+        """Open the transaction explicitly so DDL on ``conn`` can roll back.
+
+        pysqlite only starts a transaction before INSERT/UPDATE/DELETE, so
+        a ``DROP`` or ``CREATE`` issued first would commit on its own.
+        """
+        conn.exec_driver_sql("BEGIN")
+
+    def bulk_insert(
+        self, table: Table, rows: list[dict], conn: Connection | None = None
+    ) -> int:
+        """Insert ``rows`` into ``table`` in a single transaction.
+
+        With ``conn`` the rows are written in the caller's transaction straight
+        through the DB-API, skipping SQLAlchemy's per-row parameter handling.
+        """
+        if conn is None or not rows:
+            return super().bulk_insert(table, rows, conn)
+        import pandas as pd
+
+        columns = [column for column in rows[0] if column in table.c]
+        frame = pd.DataFrame(rows, columns=columns)
+        for name in columns:
+            if isinstance(table.c[name].type, DateTime):
+                # Same text SQLAlchemy stores for DateTime on SQLite
+                dates = pd.to_datetime(frame[name])
+                if dates.dt.tz is not None:
+                    dates = dates.dt.tz_localize(None)
+                frame[name] = dates.dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+        frame = frame.astype(object).where(frame.notna(), None)
+        statement = (
+            f"INSERT INTO {table.name} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        conn.connection.cursor().executemany(
+            statement, frame.itertuples(index=False, name=None)
+        )
+        return len(rows)
+
+    def read_only_engine(self, pool_size: int = 8) -> Engine:
+        database = make_url(self.url).database
+        return create_engine(
+            f"sqlite:///file:{database}?mode=ro&uri=true",
+            pool_size=pool_size,
+            max_overflow=0,
+            connect_args={"check_same_thread": False},
+        )
+
+
+class PostgresBackend(StorageBackend):
+    # Hourly tables grow by ~9k rows per location per year; partition them
+    PARTITIONED_TABLES = (
+        HourlyWeatherRecord.__tablename__,
+        OMSolarHourlyWeatherRecord.__tablename__,
+    )
+    PARTITION_COLUMN = "date"
+    # Staging rows are disposable; skip the write-ahead log for them
+    STAGING_PREFIXES = ("UNLOGGED",)
+    UPSERT_INSERT = staticmethod(postgresql.insert)
+
+    def read_only_engine(self, pool_size: int = 8) -> Engine:
+        return create_engine(
+            self.url,
+            pool_size=pool_size,
+            max_overflow=0,
+            connect_args={"options": "-c default_transaction_read_only=on"},
+        )
+
+    def create_schema(self, metadata: MetaData = Base.metadata) -> None:
+        partitioned = [
+            table
+            for table in metadata.sorted_tables
+            if table.name in self.PARTITIONED_TABLES
+        ]
+        regular = [table for table in metadata.sorted_tables if table not in partitioned]
+        metadata.create_all(self.engine, tables=regular)
+        first_year = int(START_DATE[:4])
+        last_year = datetime.now().year + 1
+        with self.engine.begin() as conn:
+            for table in partitioned:
+                conn.execute(
+                    text(partitioned_table_ddl(table, self.PARTITION_COLUMN))
+                )
+                for statement in partition_ddl(table.name, first_year, last_year):
+                    conn.execute(text(statement))
+                for index in table.indexes:
+                    index.create(conn, checkfirst=True)
+
+    @contextmanager
+    def bulk_settings(self, conn: Connection):
+        """Don't wait for the WAL flush on every commit while loading."""
+        conn.exec_driver_sql("SET synchronous_commit TO off")
+        try:
+            yield
+        finally:
+            conn.rollback()
+            conn.exec_driver_sql("RESET synchronous_commit")
+            conn.commit()
+
+    def bulk_insert(
+        self, table: Table, rows: list[dict], conn: Connection | None = None
+    ) -> int:
+        """Stream ``rows`` through ``COPY ... FROM STDIN``.
+
+        With ``conn`` the COPY runs in the caller's transaction instead.
+        """
+        if not rows:
+            return 0
+        # Like insert(), ignore keys that are not columns of the table
+        columns = [column for column in rows[0] if column in table.c]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_copy_value(row[column]) for column in columns])
+        buffer.seek(0)
+        statement = (
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        )
+        if conn is not None:
+            _copy(conn.connection.cursor(), statement, buffer)
+            return len(rows)
+        raw = self.engine.raw_connection()
+        try:
+            _copy(raw.cursor(), statement, buffer)
+            raw.commit()
+        finally:
+            raw.close()
+        return len(rows)
+
+
+def _copy(cursor, statement: str, buffer: io.StringIO) -> None:
+    if hasattr(cursor, "copy_expert"):  # psycopg2
+        cursor.copy_expert(statement, buffer)
+    else:  # psycopg 3
+        with cursor.copy(statement) as copy:
+            copy.write(buffer.getvalue())
+
+
+def _copy_value(value):
+    # An unquoted empty field is NULL in COPY's csv format
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+
+def partitioned_table_ddl(table: Table, column: str = "date") -> str:
+    """CREATE TABLE statement for ``table`` range-partitioned on ``column``.
+
+    Postgres requires every unique key of a partitioned table to contain the
+    partition column, so the primary key becomes ``(id, <column>)``.
+    """
+    dialect = postgresql.dialect()
+    lines = []
+    for col in table.columns:
+        if col.primary_key:
+            lines.append(f"{col.name} BIGSERIAL")
+            continue
+        null = "" if col.nullable else " NOT NULL"
+        lines.append(f"{col.name} {col.type.compile(dialect=dialect)}{null}")
+    key = [col.name for col in table.primary_key.columns] + [column]
+    lines.append(f"PRIMARY KEY ({', '.join(key)})")
+    for col in table.columns:
+        if col.unique:
+            lines.append(f"UNIQUE ({col.name})")
+    for fk in table.foreign_keys:
+        lines.append(
+            f"FOREIGN KEY ({fk.parent.name}) "
+            f"REFERENCES {fk.column.table.name} ({fk.column.name})"
+        )
+    body = ",\n    ".join(lines)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {table.name} (\n    {body}\n) "
+        f"PARTITION BY RANGE ({column})"
+    )
+
+
+def partition_ddl(table_name: str, first_year: int, last_year: int) -> list[str]:
+    """One partition per calendar year plus a default catch-all partition."""
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {table_name}_y{year} PARTITION OF {table_name} "
+        f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        for year in range(first_year, last_year + 1)
+    ]
+    statements.append(
+        f"CREATE TABLE IF NOT EXISTS {table_name}_default "
+        f"PARTITION OF {table_name} DEFAULT"
+    )
+    return statements
+
+
+BACKENDS = {
+    "sqlite": SQLiteBackend,
+    "postgresql": PostgresBackend,
+}
+
+
+def create_backend(url: str) -> StorageBackend:
+    """Pick the backend for ``url`` by its dialect name."""
+    dialect = make_url(url).get_backend_name()
+    return BACKENDS.get(dialect, StorageBackend)(url)
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, insert, inspect, select
+from sqlalchemy.exc import IntegrityError
+
+from bulk_load import bulk_load, unique_key
+from models import HourlyWeatherRecord, Location, OMSolarHourlyWeatherRecord
+
+TABLE = OMSolarHourlyWeatherRecord.__table__
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _rows(hours, value=0.0, location_id=1):
+    return [
+        {
+            "location_id": location_id,
+            "date": START + timedelta(hours=hour),
+            "shortwave_radiation": value + hour,
+        }
+        for hour in hours
+    ]
+
+
+def _durability(conn):
+    if conn.dialect.name == "sqlite":
+        return (
+            conn.exec_driver_sql("PRAGMA journal_mode").scalar(),
+            conn.exec_driver_sql("PRAGMA synchronous").scalar(),
+        )
+    return conn.exec_driver_sql("SHOW synchronous_commit").scalar()
+
+
+def test_unique_key():
+    assert unique_key(TABLE) == ["location_id", "date"]
+
+
+def test_bulk_load_dedupes_and_rebuilds_indexes(database):
+    database.bulk_insert(TABLE, _rows([0], value=-100.0))
+    with database.engine.connect() as conn:
+        before = _durability(conn)
+
+    # Hour 0 is already stored; hours 1-4 are staged twice, the later copy wins
+    rows = _rows(range(5)) + _rows(range(1, 5), value=10.0)
+    added = bulk_load(TABLE, rows, backend=database, batch_size=3)
+
+    assert added == 4
+    with database.engine.connect() as conn:
+        values = conn.execute(
+            select(TABLE.c.shortwave_radiation).order_by(TABLE.c.date)
+        ).scalars()
+        assert list(values) == [-100.0, 11.0, 12.0, 13.0, 14.0]
+        assert _durability(conn) == before
+    inspector = inspect(database.engine)
+    assert [
+        index["name"] for index in inspector.get_indexes(TABLE.name) if index["unique"]
+    ] == ["ix_om_solar_hourly_weather_location_date"]
+    assert not inspector.has_table(f"{TABLE.name}_staging")
+
+
+def test_bulk_load_keeps_locations_apart(database):
+    with database.engine.begin() as conn:
+        conn.execute(
+            insert(Location).values(
+                latitude="41.14", longitude="104.82", friendly_name="Cheyenne"
+            )
+        )
+    assert bulk_load(TABLE, _rows(range(3)), backend=database) == 3
+    # Same hours at a second location are new rows, not duplicates
+    assert bulk_load(TABLE, _rows(range(3), location_id=2), backend=database) == 3
+    with database.engine.connect() as conn:
+        stored = conn.execute(
+            select(TABLE.c.location_id, func.count()).group_by(TABLE.c.location_id)
+        ).all()
+    assert sorted(stored) == [(1, 3), (2, 3)]
+
+
+def test_bulk_load_restores_settings_on_failure(database):
+    with database.engine.connect() as conn:
+        before = _durability(conn)
+
+    def rows():
+        yield from _rows(range(3))
+        raise RuntimeError("API went away")
+
+    with pytest.raises(RuntimeError):
+        bulk_load(TABLE, rows(), backend=database, batch_size=2)
+
+    with database.engine.connect() as conn:
+        assert _durability(conn) == before
+        assert conn.execute(select(TABLE.c.id)).all() == []
+    assert not inspect(database.engine).has_table(f"{TABLE.name}_staging")
+
+
+def test_failed_copy_keeps_indexes_and_rows(database):
+    hourly = HourlyWeatherRecord.__table__
+    row = {"location_id": 1, "precipitation": 0.0, "wind_speed": 1.0}
+    database.bulk_insert(hourly, [{**row, "date": START, "temperature": 1.0}])
+    # temperature is NOT NULL in the target but not in the staging table, so
+    # the copy fails after the indexes were dropped
+    rows = [
+        {**row, "date": START + timedelta(hours=hour), "temperature": None}
+        for hour in range(1, 4)
+    ]
+    with pytest.raises(IntegrityError):
+        bulk_load(hourly, rows, backend=database)
+
+    assert [
+        index["name"] for index in inspect(database.engine).get_indexes(hourly.name)
+    ] == ["ix_hourly_weather_location_date"]
+    with database.engine.connect() as conn:
+        assert conn.execute(select(hourly.c.temperature)).scalars().all() == [1.0]
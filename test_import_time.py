@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from constants import ROOT_DIR
+from models import HourlyWeatherRecord
+
+# Dependencies that must only be loaded inside the commands that need them
+HEAVY_MODULES = (
+    "pandas",
+    "numpy",
+    "sqlalchemy",
+    "openmeteo_requests",
+    "requests_cache",
+    "retry_requests",
+    "pdb",
+)
+# Cumulative `-X importtime` budget for importing a CLI module, in microseconds.
+# Before deferring the heavy imports this was over a second.
+IMPORT_BUDGET_US = 400_000
+
+
+def _import_times(*args: str, env: dict | None = None) -> dict[str, int]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize("module", ["main", "weather", "constants"])
+def test_cli_import_is_light(module):
+    times = _import_times("-c", f"import {module}")
+    loaded = [name for name in HEAVY_MODULES if name in times]
+    assert loaded == [], f"importing {module} pulls in {loaded}"
+    assert times[module] < IMPORT_BUDGET_US, (
+        f"importing {module} took {times[module] / 1000:.0f} ms"
+    )
+
+
+def test_latest_hourly_command_skips_the_data_stack(database):
+    with database.engine.begin() as conn:
+        conn.execute(
+            insert(HourlyWeatherRecord).values(
+                location_id=1,
+                date=datetime(2024, 1, 1),
+                temperature=1.0,
+                precipitation=0.0,
+                wind_speed=3.0,
+            )
+        )
+    env = {**os.environ, "WEATHER_DATABASE_URL": database.url}
+    times = _import_times("weather.py", "get-latest-hourly", env=env)
+    loaded = [name for name in ("pandas", "numpy") if name in times]
+    assert loaded == [], f"get-latest-hourly pulls in {loaded}"
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+from sqlalchemy import REAL, Column, Integer, MetaData, Table, func, insert, select
+
+from models import HourlyObservation, HourlyWeatherRecord, OMSolarHourlyWeatherRecord
+from observations import (
+    copy_legacy_tables,
+    from_epoch_hours,
+    read_observations,
+    to_epoch_hours,
+    write_observations,
+)
+from variables import REGISTRY, hourly_variables
+
+START = datetime(2024, 1, 1)
+
+
+def test_hourly_variables_setting():
+    assert [variable.name for variable in hourly_variables("")] == list(REGISTRY)
+    assert [v.name for v in hourly_variables("precipitation, cloud_cover")] == [
+        "precipitation",
+        "cloud_cover",
+    ]
+    extended = hourly_variables("+cloud_cover")
+    assert extended[-1].name == "cloud_cover"
+    assert len(extended) == len(REGISTRY) + 1
+    assert "soil_temperature_54cm" in REGISTRY
+
+
+def test_epoch_hours_round_trip():
+    # Spans the spring-forward gap in local time
+    local = pd.Series(
+        pd.date_range("2024-03-10", periods=4, freq="h", tz="America/Denver")
+    )
+    hours = to_epoch_hours(local)
+    # 2024-03-10 07:00 UTC
+    assert hours[0] == 1710054000 // 3600
+    assert list(hours - hours[0]) == [0, 1, 2, 3]
+    assert list(from_epoch_hours(hours)) == list(
+        local.dt.tz_convert("UTC").dt.tz_localize(None)
+    )
+    assert to_epoch_hours([datetime(1970, 1, 1, 5, tzinfo=timezone.utc)])[0] == 5
+
+
+def test_write_merges_variables_per_hour(database):
+    dates = [START + timedelta(hours=hour) for hour in range(3)]
+    write_observations(
+        pd.DataFrame({"date": dates, "temperature_2m": [1.0, 2.0, 3.0]})
+    )
+    write_observations(
+        pd.DataFrame({"date": dates[1:], "shortwave_radiation": [20.0, float("nan")]})
+    )
+    write_observations(pd.DataFrame({"date": dates[:1], "temperature_2m": [-1.0]}))
+
+    frame = read_observations(["temperature_2m", "shortwave_radiation"])
+    assert list(frame["date"]) == dates
+    assert frame["temperature_2m"].tolist() == [-1.0, 2.0, 3.0]
+    assert frame["shortwave_radiation"].isna().tolist() == [True, False, True]
+
+    window = read_observations(
+        ["temperature_2m"], START + timedelta(hours=1), dates[-1]
+    )
+    assert window["temperature_2m"].tolist() == [2.0]
+    with pytest.raises(ValueError):
+        read_observations(["nope"])
+
+
+def test_copy_legacy_tables(database, hourly_rows):
+    hours = range(24)
+    with database.engine.begin() as conn:
+        conn.execute(
+            insert(HourlyWeatherRecord),
+            hourly_rows(START + timedelta(hours=hour) for hour in hours),
+        )
+        conn.execute(
+            insert(OMSolarHourlyWeatherRecord),
+            [
+                {
+                    "location_id": 1,
+                    "date": START + timedelta(hours=hour),
+                    "shortwave_radiation": 10.0 * hour,
+                    "terrestrial_radiation": 5.0,
+                }
+                for hour in hours
+            ],
+        )
+
+    copied = copy_legacy_tables(backend=database, chunk_size=10)
+    assert copied == {"hourly_weather": 24, "om_solar_hourly_weather": 24}
+    # Running it again only rewrites the same rows
+    copy_legacy_tables(backend=database)
+
+    table = HourlyObservation.__table__
+    with database.engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(table)).scalar() == 24
+    frame = read_observations(
+        [
+            "temperature_2m",
+            "wind_speed_10m",
+            "shortwave_radiation",
+            "terrestrial_radiation",
+        ]
+    )
+    assert frame.iloc[5].tolist()[1:] == [5.0, 3.0, 50.0, 5.0]
+
+
+def test_add_missing_columns(database):
+    Table("widget", MetaData(), Column("id", Integer, primary_key=True)).create(
+        database.engine
+    )
+    widget = Table(
+        "widget",
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("soil_moisture", REAL),
+    )
+    assert database.add_missing_columns(widget) == ["soil_moisture"]
+    assert database.add_missing_columns(widget) == []
+    with database.engine.begin() as conn:
+        conn.execute(insert(widget).values(id=1, soil_moisture=0.3))
+    widget.drop(database.engine)
@@ -0,0 +1,305 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import DBAPIError
+
+from models import (
+    DailyWeatherRecord,
+    DataVersion,
+    HourlyWeatherRecord,
+    Location,
+    OMSolarHourlyWeatherRecord,
+)
+from query_server import WeatherQueryService, create_read_only_engine, create_server
+from tiles import refresh_tiles
+from timeseries_store import TimeSeriesStore
+
+
+@pytest.fixture
+def database_url(database, hourly_rows):
+    start = datetime(2024, 1, 1)
+    with database.engine.begin() as conn:
+        conn.execute(
+            insert(HourlyWeatherRecord),
+            hourly_rows(start + timedelta(hours=hour) for hour in range(48)),
+        )
+        conn.execute(
+            insert(DailyWeatherRecord).values(
+                location_id=1,
+                date_time=start,
+                month=1,
+                day_of_month=1,
+                year=2024,
+                average_temperature=11.5,
+            )
+        )
+    return database.url
+
+
+@pytest.fixture
+def service(database_url):
+    service = WeatherQueryService(create_read_only_engine(database_url), version_ttl=0)
+    yield service
+    service.engine.dispose()
+
+
+def test_hourly_returns_one_day(service):
+    status, _, body = service.handle("/hourly?date=2024-01-02")
+    rows = json.loads(body)
+    assert status == 200
+    assert len(rows) == 24
+    assert rows[0]["date"] == "2024-01-02T00:00:00"
+
+
+def test_range_and_latest(service):
+    _, _, body = service.handle("/range?table=hourly&start=2024-01-01&end=2024-01-01")
+    assert len(json.loads(body)) == 24
+    _, _, body = service.handle("/latest?table=hourly")
+    assert json.loads(body)[0]["temperature"] == 47.0
+    _, _, body = service.handle("/daily?date=2024-01-01")
+    assert json.loads(body)[0]["average_temperature"] == 11.5
+
+
+def test_bad_requests(service):
+    assert service.handle("/hourly?date=2024-13-01")[0] == 400
+    assert service.handle("/range?table=nope&start=2024-01-01&end=2024-01-02")[0] == 400
+    assert service.handle("/nothing")[0] == 404
+
+
+@pytest.mark.parametrize("count", ["0", "-1", "10001", "many"])
+def test_recent_rejects_bad_counts(service, count):
+    assert service.handle(f"/recent?table=hourly&count={count}")[0] == 400
+
+
+def test_conditional_requests_and_cache(service):
+    status, headers, body = service.handle("/hourly?date=2024-01-01")
+    assert headers["Last-Modified"] == "Tue, 02 Jan 2024 23:00:00 GMT"
+    status, _, cached = service.handle("/hourly?date=2024-01-01")
+    assert cached == body
+    assert service.cache.hits == 1
+
+    status, _, body = service.handle(
+        "/hourly?date=2024-01-01", {"If-None-Match": headers["ETag"]}
+    )
+    assert status == 304 and body == b""
+    status, _, _ = service.handle(
+        "/hourly?date=2024-01-01", {"If-Modified-Since": headers["Last-Modified"]}
+    )
+    assert status == 304
+
+
+def test_etag_changes_after_ingest(backend, service):
+    _, before, _ = service.handle("/daily?date=2024-01-01")
+    with backend.engine.begin() as conn:
+        conn.execute(
+            insert(HourlyWeatherRecord).values(
+                location_id=1,
+                date=datetime(2024, 1, 3),
+                temperature=1.0,
+                precipitation=0.0,
+                wind_speed=1.0,
+            )
+        )
+    status, after, _ = service.handle(
+        "/daily?date=2024-01-01", {"If-None-Match": before["ETag"]}
+    )
+    assert status == 200
+    assert after["ETag"] != before["ETag"]
+
+
+def test_etag_changes_when_older_rows_are_written(database, service):
+    missing = HourlyWeatherRecord.date == datetime(2024, 1, 1, 5)
+    with database.engine.begin() as conn:
+        conn.execute(delete(HourlyWeatherRecord).where(missing))
+    _, before, body = service.handle("/hourly?date=2024-01-01")
+    assert len(json.loads(body)) == 23
+
+    # A gap refetch adds an hour older than the newest one
+    with database.engine.begin() as conn:
+        conn.execute(
+            insert(HourlyWeatherRecord).values(
+                location_id=1,
+                date=datetime(2024, 1, 1, 5),
+                temperature=5.0,
+                precipitation=0.0,
+                wind_speed=3.0,
+            )
+        )
+    status, after, body = service.handle(
+        "/hourly?date=2024-01-01", {"If-None-Match": before["ETag"]}
+    )
+    assert status == 200
+    assert len(json.loads(body)) == 24
+
+    # Rewrites keep every id and timestamp; the writer bumps the data version
+    with database.engine.begin() as conn:
+        conn.execute(update(HourlyWeatherRecord).where(missing).values(temperature=-5))
+        DataVersion.bump(conn)
+    status, _, body = service.handle(
+        "/hourly?date=2024-01-01", {"If-None-Match": after["ETag"]}
+    )
+    assert status == 200
+    assert json.loads(body)[5]["temperature"] == -5.0
+
+
+def test_read_only_connection(service):
+    with pytest.raises(DBAPIError):
+        with service.engine.begin() as conn:
+            conn.execute(
+                insert(Location).values(
+                    latitude="43.0", longitude="108.0", friendly_name="nope"
+                )
+            )
+
+
+def test_http_server(database_url):
+    server = create_server(port=0, database_url=database_url)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/hourly?date=2024-01-01"
+    try:
+        with urlopen(url) as response:
+            etag = response.headers["ETag"]
+            assert len(json.loads(response.read())) == 24
+        with pytest.raises(HTTPError) as error:
+            urlopen(Request(url, headers={"If-None-Match": etag}))
+        assert error.value.code == 304
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.service.engine.dispose()
+
+
+def test_series_uses_tiles(service):
+    refresh_tiles(["temperature"])
+    status, _, body = service.handle(
+        "/series?variable=temperature&start=2024-01-01&end=2024-01-02&width=2"
+    )
+    series = json.loads(body)
+    assert status == 200
+    assert series["resolution"] == "1d"
+    assert [bucket["max_value"] for bucket in series["buckets"]] == [23.0, 47.0]
+    bad_variable = "/series?variable=nope&start=2024-01-01&end=2024-01-02"
+    assert service.handle(bad_variable)[0] == 400
+
+
+def test_memory_store_answers_recent_queries(database_url):
+    engine = create_read_only_engine(database_url)
+    store = TimeSeriesStore(days=1).warm_up(engine)
+    service = WeatherQueryService(engine, version_ttl=0, store=store)
+    try:
+        _, _, body = service.handle("/latest?table=hourly")
+        assert json.loads(body)[0]["temperature"] == 47.0
+        _, _, body = service.handle("/recent?table=hourly&count=3")
+        assert [row["temperature"] for row in json.loads(body)] == [47.0, 46.0, 45.0]
+        _, _, body = service.handle("/range?table=hourly&start=2024-01-02&end=2024-01-02")
+        assert len(json.loads(body)) == 24
+        # Outside the one-day window: falls back to the database
+        _, _, body = service.handle("/range?table=hourly&start=2024-01-01&end=2024-01-01")
+        assert json.loads(body)[0]["id"] == 1
+    finally:
+        engine.dispose()
+
+
+def test_memory_store_answers_like_the_database(database, database_url, hourly_rows):
+    with database.engine.begin() as conn:
+        conn.execute(
+            insert(OMSolarHourlyWeatherRecord),
+            [
+                {
+                    "location_id": 1,
+                    "date": datetime(2024, 1, 2, hour),
+                    "shortwave_radiation": 100.0 + hour,
+                    "terrestrial_radiation": 5.0,
+                }
+                for hour in range(24)
+            ],
+        )
+    engine = create_read_only_engine(database_url)
+    store = TimeSeriesStore(days=1).warm_up(engine)
+    from_database = WeatherQueryService(engine, version_ttl=0)
+    from_store = WeatherQueryService(engine, version_ttl=0, store=store)
+    paths = [
+        "/latest?table=daily",
+        "/range?table=daily&start=2024-01-01&end=2024-01-01",
+        *(
+            path
+            for table in ("hourly", "solar")
+            for path in (
+                f"/latest?table={table}",
+                f"/recent?table={table}&count=5",
+                # More rows than the one-day window buffers
+                f"/recent?table={table}&count=30",
+                f"/range?table={table}&start=2024-01-02&end=2024-01-02",
+            )
+        ),
+    ]
+
+    def assert_same_answers():
+        for path in paths:
+            expected = json.loads(from_database.handle(path)[2])
+            assert expected
+            assert json.loads(from_store.handle(path)[2]) == expected, path
+
+    try:
+        # The ranges lie inside the buffered windows, so the store answers them
+        assert len(store.range("daily", datetime(2024, 1, 1), datetime(2024, 1, 2)))
+        assert_same_answers()
+
+        # A second location's hourly rows: the database answers span both
+        with database.engine.begin() as conn:
+            conn.execute(
+                insert(Location).values(
+                    latitude="43.0", longitude="108.0", friendly_name="Riverton"
+                )
+            )
+            conn.execute(
+                insert(HourlyWeatherRecord),
+                hourly_rows(
+                    (datetime(2024, 1, 3, hour) for hour in range(6)),
+                    location_id=2,
+                    temperature=[-float(hour) for hour in range(6)],
+                ),
+            )
+        store.warm_up(engine)
+        assert set(store.buffered("hourly")) == {1, 2}
+        assert_same_answers()
+    finally:
+        engine.dispose()
+
+
+def test_if_modified_since_without_zone(service):
+    _, headers, _ = service.handle("/hourly?date=2024-01-01")
+    status, _, _ = service.handle(
+        "/hourly?date=2024-01-01",
+        {"If-Modified-Since": "Wed, 03 Jan 2024 00:00:00 -0000"},
+    )
+    assert status == 304
+    status, _, _ = service.handle(
+        "/hourly?date=2024-01-01",
+        {"If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 -0000"},
+    )
+    assert status == 200
+
+
+def test_http_server_answers_500_on_errors(database_url, monkeypatch):
+    server = create_server(port=0, database_url=database_url)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def fail(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(server.service, "handle", fail)
+    url = f"http://127.0.0.1:{server.server_address[1]}/hourly?date=2024-01-01"
+    try:
+        with pytest.raises(HTTPError) as error:
+            urlopen(url)
+        assert error.value.code == 500
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.service.engine.dispose()
@@ -0,0 +1,114 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+import rollups
+from models import (
+    DailyWeatherRecord,
+    HourlyWeatherRecord,
+    Location,
+    MonthlyWeatherRecord,
+)
+from rollups import build_rollups, compute_rollups, partitions
+
+
+def _populate(database, hourly_rows, location_id=1):
+    dates = pd.date_range(datetime(2021, 11, 1), datetime(2023, 2, 1), freq="h")
+    rng = np.random.default_rng(location_id)
+    database.bulk_insert(
+        HourlyWeatherRecord.__table__,
+        hourly_rows(
+            dates.to_pydatetime(),
+            location_id=location_id,
+            temperature=rng.normal(5, 10, len(dates)),
+            precipitation=rng.exponential(0.1, len(dates)),
+            wind_speed=rng.gamma(2.0, 3.0, len(dates)),
+        ),
+    )
+    return dates
+
+
+def test_partitions_by_location_and_year(database, hourly_rows):
+    _populate(database, hourly_rows)
+    assert partitions(database.url) == [(1, 2021), (1, 2022), (1, 2023)]
+
+
+def test_parallel_output_matches_serial(database, hourly_rows):
+    _populate(database, hourly_rows)
+    serial = compute_rollups(1, database.url)
+    parallel = compute_rollups(3, database.url)
+    assert_frame_equal(serial[0], parallel[0])
+    assert_frame_equal(serial[1], parallel[1])
+
+
+def test_build_rollups_writes_both_tables(database, hourly_rows):
+    dates = _populate(database, hourly_rows)
+    daily_rows, monthly_rows = build_rollups(2, database.url)
+    assert daily_rows == len(dates.normalize().unique())
+    assert monthly_rows == 16
+
+    # Rebuilding replaces rather than appends
+    assert build_rollups(2, database.url) == (daily_rows, monthly_rows)
+    with database.engine.connect() as conn:
+        daily = pd.read_sql(select(DailyWeatherRecord), conn)
+        monthly = pd.read_sql(
+            select(MonthlyWeatherRecord).order_by(MonthlyWeatherRecord.date), conn
+        )
+        hourly = pd.read_sql(select(HourlyWeatherRecord), conn)
+    assert len(daily) == daily_rows
+
+    hourly["date"] = pd.to_datetime(hourly["date"])
+    january = hourly[hourly["date"].dt.to_period("M") == "2022-01"]
+    row = monthly[(monthly["year"] == 2022) & (monthly["month"] == 1)].iloc[0]
+    assert row["max_temperature"] == january["temperature"].max()
+    assert np.isclose(row["precipitation_sum"], january["precipitation"].sum())
+
+
+def test_build_rollups_keeps_locations_apart(database, hourly_rows):
+    with database.engine.begin() as conn:
+        conn.execute(
+            insert(Location).values(
+                latitude="41.14", longitude="104.82", friendly_name="Cheyenne"
+            )
+        )
+    dates = _populate(database, hourly_rows)
+    _populate(database, hourly_rows, location_id=2)
+    assert partitions(database.url)[-1] == (2, 2023)
+
+    days = len(dates.normalize().unique())
+    assert build_rollups(2, database.url) == (2 * days, 2 * 16)
+    with database.engine.connect() as conn:
+        monthly = pd.read_sql(select(MonthlyWeatherRecord), conn)
+    assert monthly.groupby("location_id").size().tolist() == [16, 16]
+    first, second = (
+        monthly[monthly["location_id"] == location_id]
+        .sort_values("date")["max_temperature"]
+        .tolist()
+        for location_id in (1, 2)
+    )
+    assert first != second
+
+
+def test_failed_rebuild_keeps_previous_rollups(database, hourly_rows, monkeypatch):
+    _populate(database, hourly_rows)
+    daily_rows, monthly_rows = build_rollups(1, database.url)
+
+    def duplicated(workers, database_url):
+        daily, monthly = compute_rollups(workers, database_url)
+        return pd.concat([daily, daily.head(1)]), monthly
+
+    monkeypatch.setattr(rollups, "compute_rollups", duplicated)
+    with pytest.raises(IntegrityError):
+        build_rollups(1, database.url)
+    with database.engine.connect() as conn:
+        for model, rows in (
+            (DailyWeatherRecord, daily_rows),
+            (MonthlyWeatherRecord, monthly_rows),
+        ):
+            count = conn.execute(select(func.count()).select_from(model)).scalar()
+            assert count == rows
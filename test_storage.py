@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, inspect, select, text
+
+from models import DailyWeatherRecord, HourlyWeatherRecord, OMSolarHourlyWeatherRecord
+from storage import (
+    PostgresBackend,
+    SQLiteBackend,
+    StorageBackend,
+    create_backend,
+    partition_ddl,
+    partitioned_table_ddl,
+)
+
+
+def test_backend_is_chosen_by_url():
+    assert type(create_backend("sqlite:///weather.db")) is SQLiteBackend
+    assert type(create_backend("postgresql://localhost/weather")) is PostgresBackend
+    assert type(create_backend("postgresql+psycopg://localhost/w")) is PostgresBackend
+    assert type(create_backend("mysql://localhost/weather")) is StorageBackend
+
+
+def test_bulk_insert_round_trip(database):
+    start = datetime(2024, 12, 31, 20)
+    rows = [
+        {
+            "location_id": 1,
+            "date": start + timedelta(hours=hour),
+            "shortwave_radiation": float(hour),
+            "direct_radiation": float("nan") if hour == 3 else 1.0,
+            "diffuse_radiation": None,
+            "direct_normal_irradiance": 2.0,
+            "global_tilted_irradiance": 3.0,
+        }
+        for hour in range(10)
+    ]
+    table = OMSolarHourlyWeatherRecord.__table__
+    assert database.bulk_insert(table, rows) == 10
+    with database.engine.connect() as conn:
+        stored = conn.execute(select(table).order_by(table.c.date)).all()
+    assert [row.date for row in stored] == [row["date"] for row in rows]
+    # NaN is stored as NULL on every backend
+    assert stored[3].direct_radiation is None
+    assert stored[0].diffuse_radiation is None
+    assert database.bulk_insert(table, []) == 0
+
+
+def test_create_schema_is_idempotent(database):
+    database.create_schema()
+    database.bulk_insert(
+        DailyWeatherRecord.__table__,
+        [
+            {
+                "location_id": 1,
+                "date_time": datetime(2024, 1, 1),
+                "month": 1,
+                "day_of_month": 1,
+                "year": 2024,
+            }
+        ],
+    )
+    with database.engine.connect() as conn:
+        count = conn.execute(
+            select(func.count()).select_from(DailyWeatherRecord)
+        ).scalar()
+    assert count == 1
+
+
+def test_replace_unique_keys_of_older_tables(database):
+    # hourly_weather as older versions created it: unique on date alone
+    table = HourlyWeatherRecord.__table__
+    table.drop(database.engine)
+    with database.engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE hourly_weather (id INTEGER PRIMARY KEY, "
+                "location_id INTEGER, date TIMESTAMP UNIQUE, temperature FLOAT, "
+                "precipitation FLOAT, wind_speed FLOAT)"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO hourly_weather VALUES "
+                "(1, 1, '2024-01-01 00:00:00', 1.0, 0.0, 2.0)"
+            )
+        )
+
+    assert database.replace_unique_keys(table) == ["date"]
+    assert database.replace_unique_keys(table) == []
+    inspector = inspect(database.engine)
+    assert inspector.get_unique_constraints("hourly_weather") == []
+    assert [
+        index["name"]
+        for index in inspector.get_indexes("hourly_weather")
+        if index["unique"]
+    ] == ["ix_hourly_weather_location_date"]
+    if database.engine.dialect.name == "sqlite":
+        with database.engine.connect() as conn:
+            autoindexes = conn.execute(
+                text(
+                    "SELECT name FROM sqlite_master "
+                    "WHERE name LIKE 'sqlite_autoindex_hourly_weather%'"
+                )
+            ).all()
+        assert autoindexes == []
+    with database.engine.connect() as conn:
+        assert conn.execute(select(table.c.temperature)).scalars().all() == [1.0]
+
+
+def test_hourly_tables_are_partitioned_on_postgres():
+    ddl = partitioned_table_ddl(HourlyWeatherRecord.__table__)
+    assert ddl.startswith("CREATE TABLE IF NOT EXISTS hourly_weather (")
+    assert ddl.endswith("PARTITION BY RANGE (date)")
+    assert "id BIGSERIAL" in ddl
+    assert "PRIMARY KEY (id, date)" in ddl
+    # Uniqueness comes from the droppable ix_hourly_weather_location_date index
+    assert "UNIQUE" not in ddl
+    assert "temperature FLOAT NOT NULL" in ddl
+    assert "FOREIGN KEY (location_id) REFERENCES location (id)" in ddl
+
+    statements = partition_ddl("hourly_weather", 2017, 2018)
+    assert statements == [
+        "CREATE TABLE IF NOT EXISTS hourly_weather_y2017 PARTITION OF hourly_weather "
+        "FOR VALUES FROM ('2017-01-01') TO ('2018-01-01')",
+        "CREATE TABLE IF NOT EXISTS hourly_weather_y2018 PARTITION OF hourly_weather "
+        "FOR VALUES FROM ('2018-01-01') TO ('2019-01-01')",
+        "CREATE TABLE IF NOT EXISTS hourly_weather_default "
+        "PARTITION OF hourly_weather DEFAULT",
+    ]
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, insert, select
+
+from models import ChartTile, HourlyWeatherRecord
+from tiles import bucket_start, choose_resolution, get_series, refresh_tiles
+from weather_api_importer import insert_hourly_weather_records
+
+
+def _insert_hourly(database, hourly_rows, start: datetime, hours: int) -> pd.DataFrame:
+    dates = pd.date_range(start, periods=hours, freq="h")
+    temperature = np.sin(np.arange(hours) / 24 * np.pi) * 20
+    with database.engine.begin() as conn:
+        conn.execute(
+            insert(HourlyWeatherRecord),
+            hourly_rows(dates.to_pydatetime(), temperature=temperature),
+        )
+    return pd.DataFrame({"date": dates, "temperature": temperature})
+
+
+def test_bucket_start():
+    dates = pd.Series(pd.to_datetime(["2024-03-14 17:30", "2024-03-17 23:00"]))
+    assert bucket_start(dates, "6h").tolist() == list(
+        pd.to_datetime(["2024-03-14 12:00", "2024-03-17 18:00"])
+    )
+    # 2024-03-11 is the Monday of both weeks
+    assert bucket_start(dates, "1w").tolist() == [pd.Timestamp("2024-03-11")] * 2
+    assert bucket_start(dates, "1M").tolist() == [pd.Timestamp("2024-03-01")] * 2
+
+
+def test_choose_resolution():
+    start = datetime(2017, 1, 1)
+    assert choose_resolution(start, start + timedelta(days=2), 800) == "1h"
+    assert choose_resolution(start, start + timedelta(days=90), 800) == "6h"
+    assert choose_resolution(start, start + timedelta(days=365), 800) == "1d"
+    assert choose_resolution(start, start + timedelta(days=2920), 800) == "1w"
+    assert choose_resolution(start, start + timedelta(days=2920), 100) == "1M"
+    assert choose_resolution(start, start + timedelta(days=99999), 10) == "1M"
+
+
+def test_tiles_match_raw_aggregation(database, hourly_rows):
+    raw = _insert_hourly(database, hourly_rows, datetime(2024, 1, 1), 24 * 90)
+    refresh_tiles(["temperature"])
+
+    resolution, series = get_series(
+        "temperature", datetime(2024, 1, 1), datetime(2024, 3, 1), width=100
+    )
+    assert resolution == "1d"
+    assert len(series) == 60
+    expected = raw.groupby(raw["date"].dt.normalize())["temperature"]
+    assert np.allclose(series["min_value"], expected.min().iloc[:60])
+    assert np.allclose(series["max_value"], expected.max().iloc[:60])
+    assert np.allclose(series["mean_value"], expected.mean().iloc[:60])
+    assert (series["sample_count"] == 24).all()
+
+    resolution, series = get_series(
+        "temperature", datetime(2024, 1, 1), datetime(2024, 1, 2), width=800
+    )
+    assert resolution == "1h"
+    assert len(series) == 24
+
+
+def test_incremental_refresh_replaces_touched_buckets(database, hourly_rows):
+    _insert_hourly(database, hourly_rows, datetime(2024, 1, 1), 24 * 10)
+    refresh_tiles(["temperature"])
+    _insert_hourly(database, hourly_rows, datetime(2024, 1, 11), 24 * 5)
+    refresh_tiles(["temperature"], datetime(2024, 1, 11), datetime(2024, 1, 16))
+
+    _, month = get_series(
+        "temperature", datetime(2024, 1, 1), datetime(2024, 2, 1), width=1
+    )
+    assert month["sample_count"].tolist() == [24 * 15]
+    with database.engine.connect() as conn:
+        days = conn.execute(
+            select(func.count())
+            .select_from(ChartTile)
+            .where(ChartTile.resolution == "1d")
+        ).scalar()
+    assert days == 15
+
+
+def test_partial_refresh_matches_full_rebuild(database, hourly_rows):
+    _insert_hourly(database, hourly_rows, datetime(2024, 1, 1), 24 * 91)
+
+    def tiles():
+        with database.engine.connect() as conn:
+            return pd.read_sql(
+                select(
+                    ChartTile.resolution,
+                    ChartTile.bucket_start,
+                    ChartTile.min_value,
+                    ChartTile.max_value,
+                    ChartTile.mean_value,
+                    ChartTile.sample_count,
+                ).order_by(ChartTile.resolution, ChartTile.bucket_start),
+                conn,
+            )
+
+    refresh_tiles(["temperature"])
+    full = tiles()
+    # The week of 2024-01-29 straddles January's end, so refreshing early
+    # January also has to rebuild it from February's hours
+    refresh_tiles(["temperature"], datetime(2024, 1, 9), datetime(2024, 1, 10))
+    pd.testing.assert_frame_equal(tiles(), full)
+
+
+def test_import_updates_solar_tiles(database):
+    dates = pd.date_range("2024-06-01", periods=48, freq="h", tz="UTC")
+    records = pd.DataFrame({"date": dates})
+    for column in (
+        "shortwave_radiation",
+        "direct_radiation",
+        "diffuse_radiation",
+        "direct_normal_irradiance",
+        "global_tilted_irradiance",
+        "terrestrial_radiation",
+    ):
+        records[column] = 100.0
+    insert_hourly_weather_records(records)
+
+    resolution, series = get_series(
+        "shortwave_radiation", datetime(2024, 6, 1), datetime(2024, 6, 3), width=2
+    )
+    assert resolution == "1d"
+    assert series["mean_value"].tolist() == [100.0, 100.0]
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import insert
+
+import timeseries_store
+import weather
+from models import DailyWeatherRecord, HourlyWeatherRecord, OMSolarHourlyWeatherRecord
+from timeseries_store import RingBuffer, TimeSeriesStore
+
+START = datetime(2024, 1, 1)
+
+
+def _hours(count: int, first: int = 0) -> np.ndarray:
+    return np.array(
+        [START + timedelta(hours=hour) for hour in range(first, first + count)],
+        dtype="datetime64[us]",
+    )
+
+
+def test_ring_buffer_keeps_latest_rows_in_order():
+    buffer = RingBuffer(capacity=5, width=1)
+    for first in range(0, 23, 3):
+        times = _hours(3, first)
+        buffer.append(times, np.arange(first, first + 3, dtype=float)[:, None])
+    times, values = buffer.view()
+    assert len(buffer) == 5
+    assert values[:, 0].tolist() == [19.0, 20.0, 21.0, 22.0, 23.0]
+    assert (np.diff(times) > np.timedelta64(0)).all()
+
+
+def test_ring_buffer_overlapping_rows_replace_stored_ones():
+    buffer = RingBuffer(capacity=10, width=1)
+    buffer.append(_hours(6), np.zeros((6, 1)))
+    buffer.append(_hours(4, first=4), np.ones((4, 1)))
+    _, values = buffer.view()
+    assert values[:, 0].tolist() == [0, 0, 0, 0, 1, 1, 1, 1]
+
+
+@pytest.fixture
+def database(database, hourly_rows):
+    with database.engine.begin() as conn:
+        conn.execute(
+            insert(HourlyWeatherRecord),
+            hourly_rows(START + timedelta(hours=hour) for hour in range(96)),
+        )
+        conn.execute(
+            insert(DailyWeatherRecord),
+            [
+                {
+                    "location_id": 1,
+                    "date_time": START + timedelta(days=day),
+                    "month": 1,
+                    "day_of_month": day + 1,
+                    "year": 2024,
+                    "average_temperature": float(day),
+                }
+                for day in range(4)
+            ],
+        )
+    return database
+
+
+def test_warm_up_latest_last_and_range(database):
+    store = TimeSeriesStore(days=2).warm_up()
+    latest = store.latest("hourly")
+    assert latest.date == START + timedelta(hours=95)
+    assert latest.temperature == 95.0
+    assert store.latest("daily").average_temperature == 3.0
+    assert store.latest("solar") is None
+
+    assert store.last("hourly", 48)["temperature"].tolist() == list(
+        map(float, range(48, 96))
+    )
+    recent = store.range("hourly", START + timedelta(days=3), START + timedelta(days=4))
+    assert len(recent) == 24
+    # Older than the buffered window: the caller has to ask the database
+    assert store.range("hourly", START, START + timedelta(days=1)) is None
+
+
+def test_refresh_and_append(database):
+    store = TimeSeriesStore(days=2).warm_up()
+    with database.engine.begin() as conn:
+        conn.execute(
+            insert(HourlyWeatherRecord).values(
+                location_id=1,
+                date=START + timedelta(hours=96),
+                temperature=96.0,
+                precipitation=0.0,
+                wind_speed=3.0,
+            )
+        )
+    store.refresh()
+    assert store.latest("hourly").temperature == 96.0
+    assert len(store.last("hourly", 1000)) == 48
+    assert store.buffered("hourly") == {1: 48}
+
+    imported = pd.DataFrame(
+        {
+            "date": [datetime(2024, 1, 5, 1, tzinfo=timezone.utc)],
+            "shortwave_radiation": [120.0],
+        }
+    )
+    store.append("solar", 1, imported)
+    latest = store.latest("solar")
+    assert latest.date == datetime(2024, 1, 5, 1)
+    assert latest.shortwave_radiation == 120.0
+    # Columns the import did not set are None, like NULL from the database
+    assert latest.direct_radiation is None
+    assert latest.id is None
+
+
+def test_reload_reads_stored_rows_back(database):
+    store = TimeSeriesStore(days=2).warm_up()
+    with database.engine.begin() as conn:
+        conn.execute(
+            insert(OMSolarHourlyWeatherRecord).values(
+                location_id=1,
+                date=START + timedelta(hours=95),
+                shortwave_radiation=120.0,
+            )
+        )
+    # The importer passes UTC-aware bounds
+    hour = START.replace(tzinfo=timezone.utc) + timedelta(hours=95)
+    store.reload("solar", hour, hour + timedelta(hours=1))
+    latest = store.latest("solar")
+    assert latest == (1, 1, START + timedelta(hours=95), 120.0, *[None] * 5)
+
+
+def test_weather_latest_uses_newest_timestamp(database, monkeypatch):
+    # Insert an older hour last so the highest id is not the newest row
+    with database.engine.begin() as conn:
+        conn.execute(
+            insert(HourlyWeatherRecord).values(
+                location_id=1,
+                date=START - timedelta(hours=1),
+                temperature=-1.0,
+                precipitation=0.0,
+                wind_speed=3.0,
+            )
+        )
+    assert weather.get_latest_hourly().temperature == 95.0
+    assert weather.get_latest_daily().average_temperature == 3.0
+
+    monkeypatch.setattr(timeseries_store, "_store", None)
+    store = timeseries_store.start_store(days=1)
+    assert timeseries_store.active_store() is store
+    assert weather.get_latest_hourly() == store.latest("hourly")
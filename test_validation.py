@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from models import DataQualityIssue
+from validation import gap_windows, record_issues, refetch_gaps, validate_hourly
+
+
+def _hours(start: str, periods: int) -> pd.DatetimeIndex:
+    return pd.date_range(start, periods=periods, freq="h", tz="UTC")
+
+
+def _records(dates, **columns) -> pd.DataFrame:
+    frame = pd.DataFrame({"date": dates})
+    for name, values in columns.items():
+        frame[name] = values
+    return frame
+
+
+def _issues(report, issue_type):
+    return report.issues[report.issues["issue_type"] == issue_type]
+
+
+def test_clean_data_has_no_issues():
+    records = _records(_hours("2024-01-10", 48), shortwave_radiation=np.arange(48.0))
+    report = validate_hourly(records)
+    assert report.issues.empty
+    assert len(report.clean) == 48
+
+
+def test_missing_hours_are_compacted_into_windows():
+    dates = _hours("2024-01-10", 48).delete([5, 6, 7, 30])
+    report = validate_hourly(
+        _records(dates, shortwave_radiation=1.0),
+        start=pd.Timestamp("2024-01-10", tz="UTC"),
+        end=pd.Timestamp("2024-01-12 02:00", tz="UTC"),
+    )
+    gaps = report.gaps()
+    assert gaps["row_count"].tolist() == [3, 1, 2]
+    assert gaps["start"].iloc[0] == pd.Timestamp("2024-01-10 05:00", tz="UTC")
+    assert gaps["end"].iloc[0] == pd.Timestamp("2024-01-10 07:00", tz="UTC")
+
+
+def test_existing_hours_are_not_missing():
+    dates = _hours("2024-01-10", 24)
+    existing = set(dates[:12].tz_localize(None).to_pydatetime())
+    report = validate_hourly(
+        _records(dates[12:], shortwave_radiation=1.0),
+        start=dates[0],
+        end=dates[-1] + pd.Timedelta(hours=1),
+        existing=existing,
+    )
+    assert report.gaps().empty
+
+
+def test_duplicates_nans_and_implausible_values():
+    dates = _hours("2024-01-10", 6)
+    dates = dates.append(dates[2:3])
+    records = _records(
+        dates,
+        shortwave_radiation=[1.0, np.nan, 2.0, 3.0, 9000.0, np.nan, 2.0],
+        direct_radiation=[1.0, 1.0, 1.0, -5.0, 1.0, np.nan, 1.0],
+    )
+    report = validate_hourly(records)
+
+    assert _issues(report, "duplicate")["row_count"].tolist() == [1]
+    implausible = _issues(report, "implausible")
+    assert sorted(implausible["column_name"]) == [
+        "direct_radiation",
+        "shortwave_radiation",
+    ]
+    nan = _issues(report, "nan")
+    # 01:00 lost its radiation value; 05:00 has no values at all, so it is a gap
+    assert nan[nan["column_name"] == "shortwave_radiation"]["row_count"].sum() == 2
+    assert report.gaps()["start"].tolist() == [pd.Timestamp("2024-01-10 05:00", tz="UTC")]
+    assert len(report.clean) == 5
+    assert report.clean["shortwave_radiation"].isna().sum() == 2
+
+
+def test_implausible_precipitation_in_inches():
+    # 20 inches in an hour is over 500 mm: a unit mix-up, not rain
+    records = _records(_hours("2024-07-10", 3), precipitation=[0.0, 1.5, 20.0])
+    implausible = _issues(validate_hourly(records), "implausible")
+    assert implausible["column_name"].tolist() == ["precipitation"]
+    assert implausible["start"].tolist() == [pd.Timestamp("2024-07-10 02:00", tz="UTC")]
+
+
+def test_dst_transition_in_utc_data_is_not_an_issue():
+    # US daylight saving started at 2024-03-10 09:00 UTC in America/Denver
+    report = validate_hourly(
+        _records(_hours("2024-03-10", 24), shortwave_radiation=1.0)
+    )
+    assert report.issues.empty
+
+
+def test_naive_local_timestamps_around_dst_are_flagged():
+    # Local wall-clock hours: 02:00 never happens in spring, 01:00 twice in fall
+    spring = pd.date_range("2024-03-10", periods=5, freq="h").delete(2)
+    fall = pd.date_range("2024-11-03", periods=4, freq="h").insert(2, "2024-11-03 01:00")
+    report = validate_hourly(_records(spring.append(fall), shortwave_radiation=1.0))
+    shifts = _issues(report, "dst_shift")
+    assert shifts["start"].tolist() == [
+        pd.Timestamp("2024-03-10 03:00", tz="UTC"),
+        pd.Timestamp("2024-11-03 01:00", tz="UTC"),
+    ]
+    # Naive UTC data without such steps is never flagged
+    utc = pd.date_range("2024-03-10", periods=24, freq="h")
+    assert _issues(validate_hourly(_records(utc, x=1.0)), "dst_shift").empty
+
+
+def test_gap_windows_merge_adjacent_days():
+    issues = pd.DataFrame(
+        {
+            "issue_type": ["missing", "missing", "missing", "nan"],
+            "column_name": [None, None, None, "x"],
+            "start": pd.to_datetime(
+                ["2024-01-10 12:00", "2024-01-11 20:00", "2024-02-01 12:00", "2024-03-01 00:00"]
+            ).tz_localize("UTC"),
+            "end": pd.to_datetime(
+                ["2024-01-10 13:00", "2024-01-11 21:00", "2024-02-01 12:00", "2024-03-01 00:00"]
+            ).tz_localize("UTC"),
+            "row_count": [2, 2, 1, 1],
+        }
+    )
+    assert gap_windows(issues) == [
+        ("2024-01-10", "2024-01-11"),
+        ("2024-02-01", "2024-02-01"),
+    ]
+
+
+def test_refetch_only_returns_gap_hours():
+    dates = _hours("2024-01-10 07:00", 24)
+    report = validate_hourly(
+        _records(dates.delete([3, 4]), shortwave_radiation=1.0), start=dates[0], end=dates[-1]
+    )
+    requested = []
+
+    def fetch(start_date, end_date):
+        requested.append((start_date, end_date))
+        return _records(dates, shortwave_radiation=5.0)
+
+    filled = refetch_gaps(report.gaps(), fetch)
+    assert requested == [("2024-01-10", "2024-01-10")]
+    assert filled["date"].tolist() == list(dates[3:5])
+
+
+def test_record_issues_replaces_window(database):
+    dates = _hours("2024-01-10", 24)
+    window = (dates[0], dates[-1] + pd.Timedelta(hours=1))
+    broken = validate_hourly(
+        _records(dates.delete([3]), shortwave_radiation=1.0), *window
+    )
+    assert record_issues(broken, "om_solar_hourly_weather", *window) == 1
+    fixed = validate_hourly(_records(dates, shortwave_radiation=1.0), *window)
+    assert record_issues(fixed, "om_solar_hourly_weather", *window) == 0
+    with database.engine.connect() as conn:
+        assert conn.execute(select(DataQualityIssue)).all() == []
@@ -0,0 +1,238 @@
+"""Pre-aggregated chart tiles for plotting long hourly series.
+
+Each hourly variable is summarised per location into min/max/mean buckets at
+several resolutions (6h, day, week, month) stored in ``chart_tile``. A chart
+asks for a range and its pixel width, and ``get_series`` answers from the
+finest resolution that yields no more buckets than pixels, so drawing a
+min/max band per pixel column looks the same as plotting every hour while
+reading a few hundred rows instead of 75k. Short ranges fall through to the
+raw hourly rows.
+
+Tiles are refreshed for the affected buckets whenever hourly rows are
+imported (see ``weather_api_importer.insert_hourly_weather_records``).
+"""
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+from pandas import DataFrame
+from sqlalchemy import delete, insert, select
+from sqlalchemy.engine import Engine
+
+from constants import get_engine
+from models import (
+    ChartTile,
+    DataVersion,
+    HourlyWeatherRecord,
+    OMSolarHourlyWeatherRecord,
+)
+
+_HOURLY = HourlyWeatherRecord.__table__
+_SOLAR = OMSolarHourlyWeatherRecord.__table__
+
+# chart variable -> (hourly table, column)
+TILE_VARIABLES = {
+    "temperature": (_HOURLY, "temperature"),
+    "precipitation": (_HOURLY, "precipitation"),
+    "wind_speed": (_HOURLY, "wind_speed"),
+    "shortwave_radiation": (_SOLAR, "shortwave_radiation"),
+    "direct_radiation": (_SOLAR, "direct_radiation"),
+    "diffuse_radiation": (_SOLAR, "diffuse_radiation"),
+    "direct_normal_irradiance": (_SOLAR, "direct_normal_irradiance"),
+    "global_tilted_irradiance": (_SOLAR, "global_tilted_irradiance"),
+}
+
+# resolution -> nominal bucket length, finest first. "1h" is the raw data.
+RESOLUTIONS = {
+    "1h": timedelta(hours=1),
+    "6h": timedelta(hours=6),
+    "1d": timedelta(days=1),
+    "1w": timedelta(weeks=1),
+    "1M": timedelta(days=30.436875),
+}
+TILED_RESOLUTIONS = [resolution for resolution in RESOLUTIONS if resolution != "1h"]
+
+SERIES_COLUMNS = [
+    "bucket_start",
+    "min_value",
+    "max_value",
+    "mean_value",
+    "sample_count",
+]
+
+
+def bucket_start(dates: pd.Series, resolution: str) -> pd.Series:
+    """Start of the ``resolution`` bucket each timestamp falls in."""
+    if resolution == "1h":
+        return dates.dt.floor("h")
+    if resolution == "6h":
+        return dates.dt.floor("6h")
+    if resolution == "1d":
+        return dates.dt.normalize()
+    if resolution == "1w":
+        # Weeks start on Monday
+        return dates.dt.normalize() - pd.to_timedelta(dates.dt.weekday, unit="D")
+    if resolution == "1M":
+        return dates.dt.to_period("M").dt.start_time
+    raise ValueError(f"Unknown resolution '{resolution}'")
+
+
+def _bucket_end(start: pd.Timestamp, resolution: str) -> pd.Timestamp:
+    if resolution == "1M":
+        return start + pd.DateOffset(months=1)
+    return start + RESOLUTIONS[resolution]
+
+
+def _covering_window(start: datetime, end: datetime) -> tuple[datetime, datetime]:
+    """Widen ``[start, end)`` until no bucket at any resolution is partial.
+
+    Weeks straddle month ends, so covering a week can uncover a month and the
+    other way round; widen until the window stops moving.
+    """
+    # Stored timestamps are naive UTC
+    window_start, window_end = pd.Series(
+        pd.to_datetime([start, end], utc=True)
+    ).dt.tz_convert(None)
+    while True:
+        edges = pd.Series([window_start, window_end - timedelta(microseconds=1)])
+        buckets = {
+            resolution: bucket_start(edges, resolution)
+            for resolution in TILED_RESOLUTIONS
+        }
+        widened = (
+            min(starts[0] for starts in buckets.values()),
+            max(_bucket_end(starts[1], res) for res, starts in buckets.items()),
+        )
+        if widened == (window_start, window_end):
+            return window_start.to_pydatetime(), window_end.to_pydatetime()
+        window_start, window_end = widened
+
+
+def _read_hourly(
+    engine: Engine, variable: str, location_id: int, start=None, end=None
+) -> DataFrame:
+    table, column = TILE_VARIABLES[variable]
+    stmt = select(table.c.date, table.c[column].label("value")).where(
+        table.c.location_id == location_id
+    )
+    if start is not None:
+        stmt = stmt.where(table.c.date >= start)
+    if end is not None:
+        stmt = stmt.where(table.c.date < end)
+    with engine.connect() as conn:
+        frame = pd.read_sql(stmt.order_by(table.c.date), conn)
+    frame["date"] = pd.to_datetime(frame["date"])
+    frame["value"] = pd.to_numeric(frame["value"], errors="coerce")
+    return frame
+
+
+def aggregate(hourly: DataFrame, resolution: str) -> DataFrame:
+    """min/max/mean/count of ``hourly['value']`` per bucket."""
+    values = hourly.dropna(subset=["value"])
+    buckets = (
+        values.groupby(bucket_start(values["date"], resolution))["value"]
+        .agg(["min", "max", "mean", "count"])
+        .reset_index()
+    )
+    buckets.columns = SERIES_COLUMNS
+    return buckets
+
+
+def refresh_tiles(
+    variables: list[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    location_id: int = 1,
+) -> int:
+    """Recompute the tiles touching ``[start, end)``; everything when unbounded."""
+    engine = get_engine()
+    if start is not None and end is not None:
+        start, end = _covering_window(start, end)
+    inserted = 0
+    for variable in variables or list(TILE_VARIABLES):
+        hourly = _read_hourly(engine, variable, location_id, start, end)
+        stmt = delete(ChartTile).where(
+            ChartTile.location_id == location_id, ChartTile.variable == variable
+        )
+        if start is not None:
+            stmt = stmt.where(ChartTile.bucket_start >= start)
+        if end is not None:
+            stmt = stmt.where(ChartTile.bucket_start < end)
+        rows = []
+        for resolution in TILED_RESOLUTIONS:
+            buckets = aggregate(hourly, resolution)
+            buckets["location_id"] = location_id
+            buckets["variable"] = variable
+            buckets["resolution"] = resolution
+            rows.extend(buckets.to_dict(orient="records"))
+        # Swap the buckets in one transaction so readers never see a hole
+        with engine.begin() as conn:
+            conn.execute(stmt)
+            if rows:
+                conn.execute(insert(ChartTile), rows)
+            DataVersion.bump(conn)
+        inserted += len(rows)
+    return inserted
+
+
+def refresh_tiles_for_table(table_name: str, start: datetime, end: datetime) -> int:
+    """Refresh the variables stored in ``table_name`` after an import."""
+    variables = [
+        variable
+        for variable, (table, _) in TILE_VARIABLES.items()
+        if table.name == table_name
+    ]
+    if not variables:
+        return 0
+    return refresh_tiles(variables, start, end)
+
+
+def choose_resolution(start: datetime, end: datetime, width: int) -> str:
+    """Finest resolution giving at most one bucket per pixel across the range."""
+    span = end - start
+    for resolution, length in RESOLUTIONS.items():
+        if span / length <= width:
+            return resolution
+    return list(RESOLUTIONS)[-1]
+
+
+def get_series(
+    variable: str,
+    start: datetime,
+    end: datetime,
+    width: int,
+    location_id: int = 1,
+    engine: Engine | None = None,
+) -> tuple[str, DataFrame]:
+    """Chart-ready buckets of ``variable`` over ``[start, end)`` for ``width`` px."""
+    if variable not in TILE_VARIABLES:
+        raise ValueError(f"Unknown variable '{variable}'")
+    if width < 1:
+        raise ValueError("width must be at least one pixel")
+    engine = engine or get_engine()
+    resolution = choose_resolution(start, end, width)
+    if resolution == "1h":
+        hourly = _read_hourly(engine, variable, location_id, start, end)
+        return resolution, aggregate(hourly, resolution)
+
+    # Include the bucket that straddles ``start``
+    first = bucket_start(pd.Series(pd.to_datetime([start])), resolution)[0]
+    stmt = (
+        select(
+            ChartTile.bucket_start,
+            ChartTile.min_value,
+            ChartTile.max_value,
+            ChartTile.mean_value,
+            ChartTile.sample_count,
+        )
+        .where(ChartTile.location_id == location_id)
+        .where(ChartTile.variable == variable)
+        .where(ChartTile.resolution == resolution)
+        .where(ChartTile.bucket_start >= first.to_pydatetime())
+        .where(ChartTile.bucket_start < end)
+        .order_by(ChartTile.bucket_start)
+    )
+    with engine.connect() as conn:
+        tiles = pd.read_sql(stmt, conn)
+    tiles["bucket_start"] = pd.to_datetime(tiles["bucket_start"])
+    return resolution, tiles
@@ -0,0 +1,302 @@
+"""In-process store of the most recent days of hourly and daily data.
+
+Alerting and dashboards mostly ask for "latest" and "last 48 hours". Rather
+than ordering whole tables on every poll, a ``TimeSeriesStore`` keeps the last
+``days`` days of each series per location in NumPy ring buffers. It is warmed
+up from the database once, topped up by the import path (and by ``refresh()``
+for rows written by other processes), and answers latest/last-K/range queries
+without touching the database.
+
+    store = start_store(days=7)
+    store.latest("hourly")
+    store.last("solar", 48)
+    store.range("hourly", start, end)
+"""
+
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from sqlalchemy import Integer, func, select
+from sqlalchemy.engine import Connection, Engine
+
+from constants import get_engine
+from models import DailyWeatherRecord, HourlyWeatherRecord, OMSolarHourlyWeatherRecord
+
+# series -> (table, timestamp column, rows per day)
+SERIES = {
+    "hourly": (HourlyWeatherRecord.__table__, "date", 24),
+    "solar": (OMSolarHourlyWeatherRecord.__table__, "date", 24),
+    "daily": (DailyWeatherRecord.__table__, "date_time", 1),
+}
+
+# Buffered columns: everything but the location and the timestamp, including
+# ``id``, so rows read back match what the database returns
+COLUMNS = {
+    series: tuple(
+        column.name
+        for column in table.columns
+        if column.name not in ("location_id", time_column)
+    )
+    for series, (table, time_column, _) in SERIES.items()
+}
+
+# Integer columns are buffered as floats and converted back on the way out
+INTEGER_COLUMNS = {
+    series: {
+        column.name
+        for column in table.columns
+        if column.name in COLUMNS[series] and isinstance(column.type, Integer)
+    }
+    for series, (table, _, _) in SERIES.items()
+}
+
+# Record types returned by latest(); fields are in table order like ORM rows
+RECORDS = {
+    series: namedtuple(
+        f"{series.title()}Record", [column.name for column in table.columns]
+    )
+    for series, (table, _, _) in SERIES.items()
+}
+
+
+def _restore_value(series: str, column: str, value: float):
+    """Buffered float back to what the database returns: None, int or float."""
+    if np.isnan(value):
+        return None
+    return int(value) if column in INTEGER_COLUMNS[series] else value
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # Stored timestamps are naive UTC
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class RingBuffer:
+    """Fixed-capacity, time-ordered rows in NumPy arrays.
+
+    Rows are written into arrays twice the capacity and the live window is
+    slid back to the front when the end is reached, so the window is always
+    one contiguous, sorted slice: reads are zero-copy views and range lookups
+    are a binary search.
+    """
+
+    def __init__(self, capacity: int, width: int):
+        self.capacity = capacity
+        self.times = np.empty(2 * capacity, dtype="datetime64[us]")
+        self.values = np.empty((2 * capacity, width), dtype=np.float64)
+        self.head = 0
+        self.tail = 0
+
+    def __len__(self) -> int:
+        return self.tail - self.head
+
+    def view(self) -> tuple[np.ndarray, np.ndarray]:
+        return self.times[self.head : self.tail], self.values[self.head : self.tail]
+
+    def append(self, times: np.ndarray, values: np.ndarray) -> None:
+        """Add rows; rows overlapping the buffered window replace stored ones."""
+        if not len(times):
+            return
+        order = np.argsort(times, kind="stable")
+        times, values = times[order], values[order]
+        current_times, current_values = self.view()
+        if len(current_times) and times[0] <= current_times[-1]:
+            # Out-of-order or re-imported hours: merge, newest write wins
+            times = np.concatenate([current_times, times])
+            values = np.concatenate([current_values, values])
+            _, last = np.unique(times[::-1], return_index=True)
+            keep = len(times) - 1 - last
+            times, values = times[keep], values[keep]
+            self.head = self.tail = 0
+        times = times[-self.capacity :]
+        values = values[-self.capacity :]
+        if self.tail + len(times) > len(self.times):
+            # Slide the rows still inside the window back to the front
+            keep = min(len(self), self.capacity - len(times))
+            self.times[:keep] = self.times[self.tail - keep : self.tail]
+            self.values[:keep] = self.values[self.tail - keep : self.tail]
+            self.head, self.tail = 0, keep
+        self.times[self.tail : self.tail + len(times)] = times
+        self.values[self.tail : self.tail + len(times)] = values
+        self.tail += len(times)
+        self.head = max(self.head, self.tail - self.capacity)
+
+
+class TimeSeriesStore:
+    """Latest ``days`` days of every series, per location."""
+
+    def __init__(self, days: int = 7):
+        self.days = days
+        self._buffers: dict[tuple[str, int], RingBuffer] = {}
+        self._lock = threading.RLock()
+
+    def _buffer(self, series: str, location_id: int) -> RingBuffer:
+        key = (series, location_id)
+        if key not in self._buffers:
+            per_day = SERIES[series][2]
+            self._buffers[key] = RingBuffer(self.days * per_day, len(COLUMNS[series]))
+        return self._buffers[key]
+
+    def append(self, series: str, location_id: int, frame: DataFrame) -> None:
+        """Add rows of ``frame`` (timestamp column plus value columns)."""
+        time_column, columns = SERIES[series][1], COLUMNS[series]
+        times = pd.to_datetime(frame[time_column])
+        if times.dt.tz is not None:
+            # Stored timestamps are naive UTC
+            times = times.dt.tz_convert("UTC").dt.tz_localize(None)
+        values = (
+            frame.reindex(columns=list(columns))
+            .apply(pd.to_numeric, errors="coerce")
+            .to_numpy(dtype=np.float64)
+        )
+        with self._lock:
+            self._buffer(series, location_id).append(
+                times.to_numpy(dtype="datetime64[us]"), values
+            )
+
+    def _load(self, conn: Connection, series: str, location_id: int, *where) -> None:
+        table, time_column, _ = SERIES[series]
+        columns = COLUMNS[series]
+        ts = table.c[time_column]
+        rows = conn.execute(
+            select(ts, *(table.c[column] for column in columns))
+            .where(table.c.location_id == location_id, *where)
+            .order_by(ts)
+        ).all()
+        frame = DataFrame(rows, columns=[time_column, *columns])
+        self.append(series, location_id, frame)
+
+    def _load_latest(self, engine: Engine, series: str, newer_than: bool) -> None:
+        table, time_column, _ = SERIES[series]
+        ts = table.c[time_column]
+        stmt = select(table.c.location_id, func.max(ts)).group_by(table.c.location_id)
+        with engine.connect() as conn:
+            latest = conn.execute(stmt).all()
+            for location_id, latest_time in latest:
+                if latest_time is None:
+                    continue
+                since = latest_time - timedelta(days=self.days)
+                buffered = self._buffers.get((series, location_id))
+                if newer_than and buffered is not None and len(buffered):
+                    since = buffered.view()[0][-1].astype(datetime)
+                self._load(conn, series, location_id, ts > since)
+
+    def warm_up(self, engine: Engine | None = None) -> "TimeSeriesStore":
+        """(Re)load the last ``days`` days of every series from the database."""
+        engine = engine or get_engine()
+        with self._lock:
+            self._buffers.clear()
+            for series in SERIES:
+                self._load_latest(engine, series, newer_than=False)
+        return self
+
+    def refresh(self, engine: Engine | None = None) -> None:
+        """Pull in rows newer than the buffered ones, e.g. written elsewhere."""
+        engine = engine or get_engine()
+        with self._lock:
+            for series in SERIES:
+                self._load_latest(engine, series, newer_than=True)
+
+    def reload(
+        self,
+        series: str,
+        start: datetime,
+        end: datetime,
+        location_id: int = 1,
+        engine: Engine | None = None,
+    ) -> None:
+        """Re-read the stored rows in ``[start, end)``, e.g. after an import.
+
+        Unlike ``append`` this picks up the ids the database assigned.
+        """
+        engine = engine or get_engine()
+        start, end = _naive_utc(start), _naive_utc(end)
+        table, time_column, _ = SERIES[series]
+        ts = table.c[time_column]
+        with self._lock, engine.connect() as conn:
+            self._load(conn, series, location_id, ts >= start, ts < end)
+
+    def _frame(self, series: str, times, values, location_id: int) -> DataFrame:
+        """Rows in the column order of the table, as the database returns them."""
+        table, time_column, _ = SERIES[series]
+        columns = {"location_id": location_id, time_column: pd.to_datetime(times)}
+        for name, column in zip(COLUMNS[series], values.T):
+            if name in INTEGER_COLUMNS[series]:
+                column = [_restore_value(series, name, value) for value in column]
+            columns[name] = column
+        frame = DataFrame(columns, index=range(len(times)))
+        return frame[[column.name for column in table.columns]]
+
+    def buffered(self, series: str) -> dict[int, int]:
+        """Number of buffered rows of ``series`` per location."""
+        with self._lock:
+            return {
+                location_id: len(buffer)
+                for (name, location_id), buffer in self._buffers.items()
+                if name == series and len(buffer)
+            }
+
+    def latest(self, series: str, location_id: int = 1):
+        """Most recent record, or None when nothing is buffered."""
+        with self._lock:
+            buffer = self._buffers.get((series, location_id))
+            if buffer is None or not len(buffer):
+                return None
+            times, values = buffer.view()
+            record = {
+                name: _restore_value(series, name, value)
+                for name, value in zip(COLUMNS[series], values[-1].tolist())
+            }
+            record["location_id"] = location_id
+            record[SERIES[series][1]] = times[-1].astype(datetime)
+            return RECORDS[series](**record)
+
+    def last(self, series: str, count: int, location_id: int = 1) -> DataFrame:
+        """The ``count`` most recent rows, oldest first."""
+        with self._lock:
+            buffer = self._buffers.get((series, location_id))
+            if buffer is None or count <= 0:
+                width = len(COLUMNS[series])
+                times, values = np.empty(0, "datetime64[us]"), np.empty((0, width))
+            else:
+                times, values = buffer.view()
+                times, values = times[-count:].copy(), values[-count:].copy()
+        return self._frame(series, times, values, location_id)
+
+    def range(
+        self, series: str, start: datetime, end: datetime, location_id: int = 1
+    ) -> DataFrame | None:
+        """Rows in ``[start, end)`` (naive UTC), or None if ``start`` is older
+        than the buffered window and the database has to be asked instead."""
+        start, end = np.datetime64(start, "us"), np.datetime64(end, "us")
+        with self._lock:
+            buffer = self._buffers.get((series, location_id))
+            if buffer is None or not len(buffer):
+                return None
+            times, values = buffer.view()
+            if start <= times[-1] - np.timedelta64(self.days, "D"):
+                return None
+            lo, hi = np.searchsorted(times, [start, end])
+            times, values = times[lo:hi].copy(), values[lo:hi].copy()
+        return self._frame(series, times, values, location_id)
+
+
+_store: TimeSeriesStore | None = None
+
+
+def start_store(days: int = 7, engine: Engine | None = None) -> TimeSeriesStore:
+    """Create the process-wide store and warm it up from the database."""
+    global _store
+    _store = TimeSeriesStore(days).warm_up(engine)
+    return _store
+
+
+def active_store() -> TimeSeriesStore | None:
+    """The process-wide store, if ``start_store`` has been called."""
+    return _store
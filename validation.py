@@ -0,0 +1,266 @@
+"""Data quality checks for hourly weather records before they are imported.
+
+``validate_hourly`` inspects a frame of hourly records (a ``date`` column plus
+one column per variable) with vectorised pandas operations and reports:
+
+* ``missing``    - hours absent from the expected range, or present with no values
+* ``duplicate``  - repeated timestamps (only the first occurrence is kept)
+* ``dst_shift``  - naive timestamps that repeat or skip the hour of a local
+                   daylight saving transition, i.e. local wall-clock times
+                   passed off as UTC (timezone-aware input cannot have this)
+* ``nan``        - individual values missing from an otherwise populated hour
+* ``implausible``- values outside the physically plausible range of a column
+
+Consecutive problem hours are collapsed into one ``[start, end]`` window, so
+the issue table stays compact and gap windows can be re-fetched directly.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from sqlalchemy import delete, insert
+
+from constants import TIMEZONE, get_engine
+from models import DataQualityIssue
+from variables import REGISTRY
+
+HOUR = pd.Timedelta(hours=1)
+
+# Inclusive (min, max) bounds outside which a value cannot be a real reading
+PLAUSIBLE_RANGES: dict[str, tuple[float, float]] = {
+    "temperature": (-80.0, 140.0),
+    # Inches per hour; the heaviest recorded hourly rainfall is about 12 inches
+    "precipitation": (0.0, 15.0),
+    "wind_speed": (0.0, 250.0),
+    # Every registered Open-Meteo variable that declares a range
+    **{
+        variable.name: variable.plausible_range
+        for variable in REGISTRY.values()
+        if variable.plausible_range is not None
+    },
+}
+
+ISSUE_COLUMNS = ["issue_type", "column_name", "start", "end", "row_count"]
+
+
+@dataclass
+class ValidationReport:
+    issues: DataFrame
+    clean: DataFrame
+
+    def counts(self) -> dict[str, int]:
+        """Affected hours per issue type."""
+        if self.issues.empty:
+            return {}
+        return self.issues.groupby("issue_type")["row_count"].sum().to_dict()
+
+    def gaps(self) -> DataFrame:
+        return self.issues[self.issues["issue_type"] == "missing"]
+
+
+def _to_utc(values) -> pd.Series:
+    dates = pd.Series(pd.to_datetime(values))
+    if dates.dt.tz is None:
+        # The database stores naive UTC timestamps
+        return dates.dt.tz_localize("UTC")
+    return dates.dt.tz_convert("UTC")
+
+
+def _runs(
+    dates: pd.Series, mask: pd.Series, issue_type: str, column=None
+) -> DataFrame:
+    """Collapse flagged rows of an hourly, sorted series into windows."""
+    if not mask.any():
+        return DataFrame(columns=ISSUE_COLUMNS)
+    flagged = dates[mask.to_numpy()]
+    # A new run starts wherever the flagged hours stop being consecutive
+    run_id = (flagged.diff() != HOUR).cumsum()
+    runs = flagged.groupby(run_id.to_numpy()).agg(["first", "last", "size"])
+    return DataFrame(
+        {
+            "issue_type": issue_type,
+            "column_name": column,
+            "start": runs["first"].to_numpy(),
+            "end": runs["last"].to_numpy(),
+            "row_count": runs["size"].to_numpy(),
+        }
+    )
+
+
+def _dst_shifts(raw_dates, timezone: str) -> DataFrame:
+    """Naive timestamps stepping 0h or 2h across a local DST transition."""
+    naive = pd.Series(pd.to_datetime(raw_dates))
+    if naive.dt.tz is not None or len(naive) < 2:
+        return DataFrame(columns=ISSUE_COLUMNS)
+    naive = naive.sort_values(kind="stable").reset_index(drop=True)
+    step = naive.diff()
+    # Wall-clock hours that occur twice (fall back) or never (spring forward)
+    repeated = naive.dt.tz_localize(
+        timezone, ambiguous="NaT", nonexistent="shift_forward"
+    ).isna()
+    skipped = (naive - HOUR).dt.tz_localize(
+        timezone, ambiguous=np.zeros(len(naive), dtype=bool), nonexistent="NaT"
+    ).isna()
+    shifted = (step.eq(pd.Timedelta(0)) & repeated) | (step.eq(2 * HOUR) & skipped)
+    return _runs(_to_utc(naive), shifted, "dst_shift")
+
+
+def validate_hourly(
+    records: DataFrame,
+    start=None,
+    end=None,
+    existing=None,
+    ranges: dict[str, tuple[float, float]] = PLAUSIBLE_RANGES,
+    timezone: str = TIMEZONE,
+) -> ValidationReport:
+    """Check hourly ``records`` and return the issues found plus a clean copy.
+
+    ``start``/``end`` bound the expected hours (end exclusive); without them
+    only gaps between the first and last timestamp are found. Hours listed in
+    ``existing`` (already stored) are not reported as missing.
+    """
+    value_columns = [column for column in records.columns if column != "date"]
+    issues = [_dst_shifts(records["date"], timezone)]
+    frame = records.copy()
+    frame["date"] = _to_utc(frame["date"]).to_numpy()
+    frame = frame.sort_values("date", kind="stable").reset_index(drop=True)
+    dates = frame["date"]
+
+    duplicated = dates.duplicated(keep="first")
+    issues.append(_runs(dates, duplicated, "duplicate"))
+    frame = frame[~duplicated.to_numpy()].reset_index(drop=True)
+    dates = frame["date"]
+
+    values = frame[value_columns].apply(pd.to_numeric, errors="coerce")
+    low = pd.Series({c: ranges.get(c, (-np.inf, np.inf))[0] for c in value_columns})
+    high = pd.Series({c: ranges.get(c, (-np.inf, np.inf))[1] for c in value_columns})
+    implausible = values.lt(low) | values.gt(high)
+    for column in value_columns:
+        issues.append(_runs(dates, implausible[column], "implausible", column))
+    # Implausible readings are as good as missing from here on
+    values = values.mask(implausible)
+
+    # Hours with no usable value at all count as missing, not as NaN values
+    empty = values.isna().all(axis=1).to_numpy() & bool(value_columns)
+    for column in value_columns:
+        issues.append(_runs(dates, values[column].isna() & ~empty, "nan", column))
+
+    present = pd.DatetimeIndex(dates[~empty])
+    if existing is not None and len(existing):
+        present = present.union(pd.DatetimeIndex(_to_utc(list(existing))))
+    expected_start = _to_utc([start])[0] if start is not None else dates.min()
+    expected_end = _to_utc([end])[0] if end is not None else dates.max() + HOUR
+    if pd.notna(expected_start) and pd.notna(expected_end):
+        expected = pd.date_range(
+            expected_start, expected_end, freq="h", inclusive="left"
+        )
+        missing = pd.Series(expected.difference(present))
+        issues.append(_runs(missing, missing.notna(), "missing"))
+
+    issues = [issue for issue in issues if not issue.empty]
+    if issues:
+        issue_frame = pd.concat(issues, ignore_index=True)
+    else:
+        issue_frame = DataFrame(columns=ISSUE_COLUMNS)
+
+    clean = frame.loc[~empty, ["date"]].copy()
+    clean[value_columns] = values[~empty]
+    return ValidationReport(issues=issue_frame, clean=clean.reset_index(drop=True))
+
+
+def _naive_utc(value) -> datetime:
+    return _to_utc([value])[0].tz_convert(None).to_pydatetime()
+
+
+def record_issues(
+    report: ValidationReport,
+    table_name: str,
+    window_start: datetime,
+    window_end: datetime,
+    location_id: int = 1,
+    issue_types: tuple[str, ...] | None = None,
+) -> int:
+    """Replace the stored issues for ``table_name`` within the validated window.
+
+    Pass ``issue_types`` to only replace issues of those types.
+    """
+    window_start = _naive_utc(window_start)
+    window_end = _naive_utc(window_end)
+    issues = report.issues
+    if issue_types is not None:
+        issues = issues[issues["issue_type"].isin(issue_types)]
+    rows = [
+        {
+            "location_id": location_id,
+            "table_name": table_name,
+            "issue_type": issue.issue_type,
+            "column_name": issue.column_name,
+            "start": _naive_utc(issue.start),
+            "end": _naive_utc(issue.end),
+            "row_count": int(issue.row_count),
+            "detected_at": datetime.now(),
+        }
+        for issue in issues.itertuples(index=False)
+    ]
+    stmt = (
+        delete(DataQualityIssue)
+        .where(DataQualityIssue.location_id == location_id)
+        .where(DataQualityIssue.table_name == table_name)
+        .where(DataQualityIssue.start >= window_start)
+        .where(DataQualityIssue.start < window_end)
+    )
+    if issue_types is not None:
+        stmt = stmt.where(DataQualityIssue.issue_type.in_(issue_types))
+    with get_engine().begin() as conn:
+        conn.execute(stmt)
+        if rows:
+            conn.execute(insert(DataQualityIssue), rows)
+    return len(rows)
+
+
+def gap_windows(issues: DataFrame, timezone: str = TIMEZONE) -> list[tuple[str, str]]:
+    """Local calendar-day ranges covering the ``missing`` windows in ``issues``.
+
+    The archive API is queried by day, so overlapping or adjacent gap days are
+    merged into a single request.
+    """
+    gaps = issues[issues["issue_type"] == "missing"]
+    if gaps.empty:
+        return []
+    starts = _to_utc(gaps["start"]).dt.tz_convert(timezone).dt.normalize()
+    ends = _to_utc(gaps["end"]).dt.tz_convert(timezone).dt.normalize()
+    order = np.argsort(starts.to_numpy())
+    windows: list[list] = []
+    for first, last in zip(starts.iloc[order], ends.iloc[order]):
+        if windows and first <= windows[-1][1] + timedelta(days=1):
+            windows[-1][1] = max(windows[-1][1], last)
+        else:
+            windows.append([first, last])
+    return [(a.strftime("%Y-%m-%d"), b.strftime("%Y-%m-%d")) for a, b in windows]
+
+
+def refetch_gaps(issues: DataFrame, fetch) -> DataFrame:
+    """Re-request only the gap windows and return the newly filled hours.
+
+    ``fetch(start_date, end_date)`` returns hourly records like
+    ``get_hourly_weather_records_by_date``. Rows outside the reported gaps are
+    discarded, so the result can be inserted without touching stored hours.
+    """
+    gaps = issues[issues["issue_type"] == "missing"]
+    frames = []
+    for start_date, end_date in gap_windows(gaps):
+        fetched = fetch(start_date, end_date)
+        if fetched is None or fetched.empty:
+            continue
+        frames.append(validate_hourly(fetched).clean)
+    if not frames:
+        return DataFrame()
+    filled = pd.concat(frames, ignore_index=True).drop_duplicates("date")
+    wanted = np.zeros(len(filled), dtype=bool)
+    dates = filled["date"]
+    for start, end in zip(_to_utc(gaps["start"]), _to_utc(gaps["end"])):
+        wanted |= ((dates >= start) & (dates <= end)).to_numpy()
+    return filled[wanted].reset_index(drop=True)
@@ -0,0 +1,106 @@
+"""Registry of the Open-Meteo hourly variables we import.
+
+The registry drives both the archive API request and the columns of the
+compact ``hourly_observation`` table (see ``models.py`` and
+``observations.py``), so adding a variable is one entry here - or, without
+touching code, a name in ``WEATHER_HOURLY_VARIABLES``:
+
+    $ WEATHER_HOURLY_VARIABLES=+relative_humidity_2m,cloud_cover python main.py migrate
+
+A leading ``+`` extends the defaults; otherwise the list replaces them.
+``migrate`` adds a REAL column for every variable the table does not have yet.
+"""
+
+from dataclasses import dataclass
+from os import environ
+
+
+@dataclass(frozen=True)
+class HourlyVariable:
+    # Open-Meteo hourly variable name, also the hourly_observation column
+    name: str
+    unit: str = ""
+    # Values outside this range are flagged by the data quality stage
+    plausible_range: tuple[float, float] | None = None
+    # (table, column) holding this variable before hourly_observation existed
+    legacy: tuple[str, str] | None = None
+
+
+# Units matching the legacy tables (Fahrenheit, mph, inches)
+UNITS = {
+    "temperature_unit": "fahrenheit",
+    "wind_speed_unit": "mph",
+    "precipitation_unit": "inch",
+}
+
+REGISTRY = {
+    variable.name: variable
+    for variable in (
+        HourlyVariable(
+            "temperature_2m", "°F", (-80.0, 140.0), ("hourly_weather", "temperature")
+        ),
+        HourlyVariable(
+            "precipitation", "inch", (0.0, 15.0), ("hourly_weather", "precipitation")
+        ),
+        HourlyVariable(
+            "wind_speed_10m", "mph", (0.0, 250.0), ("hourly_weather", "wind_speed")
+        ),
+        HourlyVariable(
+            "shortwave_radiation",
+            "W/m²",
+            (0.0, 1500.0),
+            ("om_solar_hourly_weather", "shortwave_radiation"),
+        ),
+        HourlyVariable(
+            "direct_radiation",
+            "W/m²",
+            (0.0, 1500.0),
+            ("om_solar_hourly_weather", "direct_radiation"),
+        ),
+        HourlyVariable(
+            "diffuse_radiation",
+            "W/m²",
+            (0.0, 1000.0),
+            ("om_solar_hourly_weather", "diffuse_radiation"),
+        ),
+        HourlyVariable(
+            "direct_normal_irradiance",
+            "W/m²",
+            (0.0, 1500.0),
+            ("om_solar_hourly_weather", "direct_normal_irradiance"),
+        ),
+        HourlyVariable(
+            "global_tilted_irradiance",
+            "W/m²",
+            (0.0, 1500.0),
+            ("om_solar_hourly_weather", "global_tilted_irradiance"),
+        ),
+        HourlyVariable(
+            "terrestrial_radiation",
+            "W/m²",
+            (0.0, 1500.0),
+            ("om_solar_hourly_weather", "terrestrial_radiation"),
+        ),
+        HourlyVariable("soil_temperature_0cm", "°F", (-80.0, 160.0)),
+        HourlyVariable("soil_temperature_6cm", "°F", (-80.0, 160.0)),
+        HourlyVariable("soil_temperature_18cm", "°F", (-60.0, 140.0)),
+        HourlyVariable("soil_temperature_54cm", "°F", (-40.0, 120.0)),
+    )
+}
+
+
+def hourly_variables(setting: str | None = None) -> list[HourlyVariable]:
+    """Variables to import, from ``WEATHER_HOURLY_VARIABLES`` or the registry."""
+    if setting is None:
+        setting = environ.get("WEATHER_HOURLY_VARIABLES", "")
+    setting = setting.strip()
+    if not setting:
+        return list(REGISTRY.values())
+    names = [name.strip() for name in setting.lstrip("+").split(",") if name.strip()]
+    if setting.startswith("+"):
+        names = list(REGISTRY) + [name for name in names if name not in REGISTRY]
+    # Names outside the registry are imported as plain REAL columns
+    return [REGISTRY.get(name, HourlyVariable(name)) for name in dict.fromkeys(names)]
+
+
+HOURLY_VARIABLES = hourly_variables()
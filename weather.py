@@ -1,51 +1,108 @@
-import pdb
+from __future__ import annotations
 
-import typer
-from models import HourlyWeatherRecord, DailyWeatherRecord, DailyWeatherRecordInstance
-from sqlalchemy import select, Row, insert
-from constants import ENGINE, LATITUDE, LONGITUDE
+import sys
 from datetime import datetime
 from datetime import timedelta
-import pandas as pd
-from weather_api_importer import (
-    get_hourly_weather_records_by_date,
-    insert_hourly_weather_records,
-)
+from typing import TYPE_CHECKING
+
+import typer
+from constants import LATITUDE, LONGITUDE, get_engine
+
+if TYPE_CHECKING:
+    from sqlalchemy import Row
+
+# Heavy dependencies (pandas, SQLAlchemy, the Open-Meteo client) are imported
+# inside the commands that use them to keep CLI startup fast.
 
 
 app = typer.Typer()
 
 
-@app.command()
+def _active_store():
+    # Only code that already imported the NumPy-backed store module can have
+    # started a store, so look it up instead of importing it
+    store_module = sys.modules.get("timeseries_store")
+    return store_module.active_store() if store_module else None
+
+
 def get_latest_hourly() -> Row:
-    stmt = select(HourlyWeatherRecord).order_by(HourlyWeatherRecord.id.desc())
-    with ENGINE.connect() as conn:
-        results = conn.execute(stmt)
-    return results.fetchone()
+    from sqlalchemy import select
+    from models import HourlyWeatherRecord
+
+    store = _active_store()
+    latest = store.latest("hourly") if store else None
+    if latest is not None:
+        return latest
+    # Newest by timestamp (ids follow insertion order, not time), fetched
+    # while the connection is still open
+    stmt = (
+        select(HourlyWeatherRecord)
+        .order_by(HourlyWeatherRecord.date.desc())
+        .limit(1)
+    )
+    with get_engine().connect() as conn:
+        return conn.execute(stmt).fetchone()
+
+
+@app.command("get-latest-hourly")
+def print_latest_hourly():
+    print(get_latest_hourly())
 
 
 def get_latest_daily() -> Row:
-    stmt = select(DailyWeatherRecord).order_by(DailyWeatherRecord.id.desc())
-    with ENGINE.connect() as conn:
-        results = conn.execute(stmt)
-    return results.fetchone()
+    from sqlalchemy import select
+    from models import DailyWeatherRecord
+
+    store = _active_store()
+    latest = store.latest("daily") if store else None
+    if latest is not None:
+        return latest
+    stmt = (
+        select(DailyWeatherRecord)
+        .order_by(DailyWeatherRecord.date_time.desc())
+        .limit(1)
+    )
+    with get_engine().connect() as conn:
+        return conn.execute(stmt).fetchone()
 
 
 @app.command()
 def update_hourly():
+    from models import OMSolarHourlyWeatherRecord
+    from validation import record_issues, validate_hourly
+    from weather_api_importer import (
+        get_hourly_weather_records_by_date,
+        insert_hourly_weather_records,
+    )
+
     latest_record = get_latest_hourly()
     latest_date = datetime.strftime(latest_record.date, "%Y-%m-%d")
     today_date = datetime.strftime(datetime.now(), "%Y-%m-%d")
     print(f"Updating the hourly record table between {latest_date} - {today_date}")
     records = get_hourly_weather_records_by_date(latest_date, today_date)
-    clean_records = records.dropna()
-    insert_hourly_weather_records(clean_records)
+    # Only hours with no usable values are dropped; everything else that looks
+    # wrong is recorded in data_quality_issue instead of silently discarded
+    report = validate_hourly(records)
+    for issue_type, hours in report.counts().items():
+        print(f"Data quality: {hours} hours flagged as {issue_type}")
+    if not records.empty:
+        record_issues(
+            report,
+            OMSolarHourlyWeatherRecord.__tablename__,
+            records["date"].min(),
+            records["date"].max() + timedelta(hours=1),
+        )
+    insert_hourly_weather_records(report.clean)
 
 
 @app.command()
 def create_hourly_csv() -> None:
+    import pandas as pd
+    from sqlalchemy import select
+    from models import HourlyWeatherRecord
+
     stmt = select(HourlyWeatherRecord)
-    with ENGINE.connect() as conn:
+    with get_engine().connect() as conn:
         results = conn.execute(stmt)
     hourly_weather_records = pd.DataFrame(results.fetchall())
     hourly_weather_records["date"] = pd.to_datetime(hourly_weather_records["date"])
@@ -67,6 +124,14 @@ def create_hourly_csv() -> None:
 
 @app.command()
 def update_daily():
+    import pandas as pd
+    from sqlalchemy import insert
+    from models import (
+        HourlyWeatherRecord,
+        DailyWeatherRecord,
+        DailyWeatherRecordInstance,
+    )
+
     latest_record = get_latest_daily()
     latest_date = datetime.strftime(
         latest_record.date_time + timedelta(days=1), "%Y-%m-%d"
@@ -119,7 +184,7 @@ def update_daily():
                     precipitation_min=daily_record.precipitation_min,
                     precipitation_max=daily_record.precipitation_max,
                 )
-                with ENGINE.connect() as cursor:
+                with get_engine().connect() as cursor:
                     cursor.execute(stmt)
                     cursor.commit()
 
@@ -1,11 +1,17 @@
+from datetime import timedelta
+
 import openmeteo_requests
 import requests_cache
 import pandas as pd
 from pandas import DataFrame
 from retry_requests import retry
-from sqlalchemy import insert
-from models import HourlyWeatherRecord, OMSolarHourlyWeatherRecord
-from constants import ENGINE, LATITUDE, LONGITUDE
+from models import DataVersion, HourlyWeatherRecord, OMSolarHourlyWeatherRecord
+from bulk_load import bulk_load
+from constants import LATITUDE, LONGITUDE, TIMEZONE, get_backend, get_engine
+from tiles import refresh_tiles_for_table
+from timeseries_store import active_store
+from variables import HOURLY_VARIABLES, UNITS
+from observations import write_observations
 
 
 def get_hourly_weather_records_by_date(
@@ -22,25 +28,14 @@ def get_hourly_weather_records_by_date(
         "longitude": long,
         "start_date": start_date,
         "end_date": end_date,
-        "hourly": [
-            "shortwave_radiation",
-            "direct_radiation",
-            "diffuse_radiation",
-            "direct_normal_irradiance",
-            "global_tilted_irradiance",
-            "terrestrial_radiation",
-        ],
-        "timezone": "America/Denver",
+        # Every registered variable, in registry order (see variables.py)
+        "hourly": [variable.name for variable in HOURLY_VARIABLES],
+        "timezone": TIMEZONE,
+        **UNITS,
     }
     responses = openmeteo.weather_api(url, params=params)
     response = responses[0]
     hourly = response.Hourly()
-    hourly_shortwave_radiation = hourly.Variables(0).ValuesAsNumpy()
-    hourly_direct_radiation = hourly.Variables(1).ValuesAsNumpy()
-    hourly_diffuse_radiation = hourly.Variables(2).ValuesAsNumpy()
-    hourly_direct_normal_irradiance = hourly.Variables(3).ValuesAsNumpy()
-    hourly_global_tilted_irradiance = hourly.Variables(4).ValuesAsNumpy()
-    hourly_terrestrial_radiation = hourly.Variables(5).ValuesAsNumpy()
 
     hourly_data = {
         "date": pd.date_range(
@@ -49,38 +44,59 @@ def get_hourly_weather_records_by_date(
             freq=pd.Timedelta(seconds=hourly.Interval()),
             inclusive="left",
         ),
-        "shortwave_radiation": hourly_shortwave_radiation,
-        "direct_radiation": hourly_direct_radiation,
-        "diffuse_radiation": hourly_diffuse_radiation,
-        "direct_normal_irradiance": hourly_direct_normal_irradiance,
-        "global_tilted_irradiance": hourly_global_tilted_irradiance,
-        "terrestrial_radiation": hourly_terrestrial_radiation,
     }
+    for index, variable in enumerate(HOURLY_VARIABLES):
+        hourly_data[variable.name] = hourly.Variables(index).ValuesAsNumpy()
 
     return pd.DataFrame(data=hourly_data)
 
 
-def insert_hourly_weather_records(records: pd.DataFrame):
+def insert_hourly_weather_records(records: pd.DataFrame, bulk: bool = False):
     to_insert = []
+    # The solar columns of the legacy table, whichever of them were fetched
+    solar_table = OMSolarHourlyWeatherRecord.__table__
+    solar_columns = [
+        column
+        for column in records.columns
+        if column in solar_table.c and column not in ("id", "location_id", "date")
+    ]
 
-    for row in records.itertuples(index=False):
+    for row in records.to_dict(orient="records"):
         payload = {
             "location_id": 1,
             # Convert pandas Timestamp (possibly tz-aware) to naive python datetime
-            "date": pd.to_datetime(getattr(row, "date")).to_pydatetime(),
-            "shortwave_radiation": float(getattr(row, "shortwave_radiation")),
-            "direct_radiation": float(getattr(row, "direct_radiation")),
-            "diffuse_radiation": float(getattr(row, "diffuse_radiation")),
-            "direct_normal_irradiance": float(getattr(row, "direct_normal_irradiance")),
-            "global_tilted_irradiance": float(getattr(row, "global_tilted_irradiance")),
-            "terrestrial_radiation": float(getattr(row, "terrestrial_radiation")),
+            "date": pd.to_datetime(row["date"]).to_pydatetime(),
         }
+        for column in solar_columns:
+            payload[column] = float(row[column])
         to_insert.append(payload)
 
     if not to_insert:
         return
 
-    stmt = insert(OMSolarHourlyWeatherRecord)
-    # Execute in a transaction; executemany via list of dicts
-    with ENGINE.begin() as conn:
-        conn.execute(stmt, to_insert)
+    if bulk:
+        # Backfills: staging table, relaxed durability, indexes built once
+        bulk_load(OMSolarHourlyWeatherRecord.__table__, to_insert)
+    else:
+        # Single transaction (executemany on SQLite, COPY on Postgres)
+        get_backend().bulk_insert(OMSolarHourlyWeatherRecord.__table__, to_insert)
+    # Every fetched variable, one row per hour. Temperature, precipitation and
+    # wind are only kept here; hourly_weather and its consumers are not updated
+    write_observations(records)
+    # Cached query responses go stale even when only older hours were added
+    with get_engine().begin() as conn:
+        DataVersion.bump(conn)
+
+    dates = [payload["date"] for payload in to_insert]
+    # Processes holding an in-memory store see their own imports immediately;
+    # read the rows back so the store also has their ids
+    store = active_store()
+    if store is not None:
+        store.reload("solar", min(dates), max(dates) + timedelta(hours=1))
+
+    # Keep the chart tiles covering the new hours up to date
+    refresh_tiles_for_table(
+        OMSolarHourlyWeatherRecord.__tablename__,
+        min(dates),
+        max(dates) + timedelta(hours=1),
+    )